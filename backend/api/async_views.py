@@ -0,0 +1,215 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.cache import INGREDIENTS, RECIPES, TAGS, make_response_key
+from api.conditional import (collection_validators, not_modified,
+                             recipe_list_validators, recipe_validators,
+                             set_validators)
+from api.filters import RecipeFilter
+from api.indexes import ingredient_index
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.serializers import (IngredientSerializer, RecipeReadSerializer,
+                                 TagSerializer)
+from users.authentication import CachedTokenAuthentication
+from users.pagination import LimitPageNumberPagination
+
+
+class FallbackToSyncView(Exception):
+    pass
+
+
+class AsyncReadView(View):
+    cache_namespace = None
+    per_user_flags = False
+    list_view = None
+    detail_view = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method == 'GET':
+            try:
+                request.user = await self.authenticate(request)
+                return await self.get(request, *args, **kwargs)
+            except (FallbackToSyncView, APIException):
+                pass
+        sync_view = self.detail_view if 'pk' in kwargs else self.list_view
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    async def authenticate(self, request):
+        if 'HTTP_AUTHORIZATION' not in request.META:
+            return AnonymousUser()
+        credentials = await sync_to_async(
+            CachedTokenAuthentication().authenticate
+        )(request)
+        if credentials is None:
+            return AnonymousUser()
+        return credentials[0]
+
+    async def get(self, request, pk=None):
+        etag, last_modified = await sync_to_async(self.get_validators)(
+            request, pk
+        )
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(
+            await self.get_response(request, pk, etag), etag, last_modified
+        )
+
+    def get_validators(self, request, pk):
+        return collection_validators(
+            self.cache_namespace, request, 'json', self.per_user_flags
+        )
+
+    async def get_response(self, request, pk, etag):
+        if request.user.is_authenticated:
+            data = await self.get_data(request, pk)
+        else:
+            key, data = await sync_to_async(self.get_cached)(request, etag)
+            if data is None:
+                data = await self.get_data(request, pk)
+                await cache.aset(key, data, settings.API_CACHE_TIMEOUT)
+        return HttpResponse(
+            JSONRenderer().render(data), content_type='application/json'
+        )
+
+    def get_cached(self, request, etag):
+        key = make_response_key(self.cache_namespace, request, etag)
+        return key, cache.get(key)
+
+    async def get_data(self, request, pk):
+        if pk is None:
+            return await self.list(request)
+        return await self.retrieve(request, pk)
+
+    async def get_object(self, queryset, pk):
+        try:
+            return await queryset.aget(pk=pk)
+        except (queryset.model.DoesNotExist, ValueError):
+            raise FallbackToSyncView
+
+
+class TagReadView(AsyncReadView):
+    cache_namespace = TAGS
+    list_view = staticmethod(TagViewSet.as_view({'get': 'list'}))
+    detail_view = staticmethod(TagViewSet.as_view({'get': 'retrieve'}))
+
+    async def list(self, request):
+        return TagSerializer(
+            [tag async for tag in Tag.objects.all()], many=True
+        ).data
+
+    async def retrieve(self, request, pk):
+        return TagSerializer(
+            await self.get_object(Tag.objects.all(), pk)
+        ).data
+
+
+class IngredientReadView(AsyncReadView):
+    cache_namespace = INGREDIENTS
+    list_view = staticmethod(IngredientViewSet.as_view({'get': 'list'}))
+    detail_view = staticmethod(IngredientViewSet.as_view({'get': 'retrieve'}))
+
+    async def list(self, request):
+        limit = request.GET.get('limit')
+        if limit is not None and (not limit.isdigit() or int(limit) < 1):
+            raise FallbackToSyncView
+        return await sync_to_async(ingredient_index.search)(
+            request.GET.get('name', ''),
+            int(limit) if limit is not None else None
+        )
+
+    async def retrieve(self, request, pk):
+        return IngredientSerializer(
+            await self.get_object(Ingredient.objects.all(), pk)
+        ).data
+
+
+class RecipeReadView(AsyncReadView):
+    cache_namespace = RECIPES
+    per_user_flags = True
+    list_view = staticmethod(RecipeViewSet.as_view({
+        'get': 'list', 'post': 'create'
+    }))
+    detail_view = staticmethod(RecipeViewSet.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update',
+        'delete': 'destroy'
+    }))
+
+    def get_validators(self, request, pk):
+        if pk is None:
+            return recipe_list_validators(request, 'json')
+        return recipe_validators(request, pk, 'json')
+
+    def get_page(self, request):
+        pagination = LimitPageNumberPagination
+        if pagination.cursor_query_param in request.GET:
+            raise FallbackToSyncView
+        page = request.GET.get(pagination.page_query_param, '1')
+        size = request.GET.get(
+            pagination.page_size_query_param, str(pagination.page_size)
+        )
+        if not page.isdigit() or not size.isdigit():
+            raise FallbackToSyncView
+        page, size = int(page), int(size) or pagination.page_size
+        if page < 1:
+            raise FallbackToSyncView
+        return page, size
+
+    def filter_queryset(self, filterset):
+        if not filterset.is_valid():
+            raise FallbackToSyncView
+        return filterset.qs
+
+    async def list(self, request):
+        page, size = self.get_page(request)
+        filterset = RecipeFilter(
+            request.GET,
+            queryset=Recipe.objects.with_read_data(request.user),
+            request=request
+        )
+        queryset = await sync_to_async(self.filter_queryset)(filterset)
+        count = await queryset.acount()
+        if (page - 1) * size >= max(count, 1):
+            raise FallbackToSyncView
+        recipes = [
+            recipe async for recipe in queryset[(page - 1) * size:page * size]
+        ]
+        url = request.build_absolute_uri()
+        page_param = LimitPageNumberPagination.page_query_param
+        return {
+            'count': count,
+            'next': (
+                replace_query_param(url, page_param, page + 1)
+                if page * size < count else None
+            ),
+            'previous': (
+                None if page == 1
+                else remove_query_param(url, page_param) if page == 2
+                else replace_query_param(url, page_param, page - 1)
+            ),
+            'results': RecipeReadSerializer(
+                recipes, many=True, context={'request': request}
+            ).data,
+        }
+
+    async def retrieve(self, request, pk):
+        return RecipeReadSerializer(
+            await self.get_object(
+                Recipe.objects.with_read_data(request.user), pk
+            ),
+            context={'request': request}
+        ).data
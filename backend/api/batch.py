@@ -0,0 +1,57 @@
+from api.signals import collect_relations, relations_changed
+
+NOT_FOUND = 'not_found'
+
+
+def add_pairs(model, owner_field, owner_id, target_field, target_ids):
+    # bulk_create не отправляет сигналов, а с ignore_conflicts и не сообщает,
+    # какие строки вставлены, поэтому недостающие пары отбираем заранее.
+    # Блокировка владельца не дает повторному клику с той же пачкой
+    # посчитать пары второй раз.
+    if not target_ids:
+        return []
+    owner = model._meta.get_field(owner_field).related_model
+    owner.objects.select_for_update().filter(pk=owner_id).exists()
+    existing = set(model.objects.filter(**{
+        owner_field: owner_id, f'{target_field}__in': target_ids
+    }).values_list(target_field, flat=True))
+    added = [pk for pk in target_ids if pk not in existing]
+    model.objects.bulk_create(
+        [
+            model(**{f'{owner_field}_id': owner_id, f'{target_field}_id': pk})
+            for pk in added
+        ],
+        ignore_conflicts=True
+    )
+    if added:
+        relations_changed(model, owner_id, added, 1)
+    return added
+
+
+def remove_pairs(model, owner_field, owner_id, target_field, target_ids):
+    if not target_ids:
+        return []
+    pairs = model.objects.filter(**{
+        owner_field: owner_id, f'{target_field}__in': target_ids
+    })
+    removed = list(
+        pairs.select_for_update().values_list(target_field, flat=True)
+    )
+    if removed:
+        with collect_relations():
+            pairs.delete()
+    return removed
+
+
+def batch_results(ids, changed, done, unchanged, skipped):
+    changed = set(changed)
+    return [
+        {
+            'id': pk,
+            'status': (
+                done if pk in changed
+                else skipped.get(pk, unchanged)
+            ),
+        }
+        for pk in ids
+    ]
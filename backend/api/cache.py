@@ -0,0 +1,92 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from foodgram_backend.cache import get_version
+
+RECIPES = 'recipes'
+RECIPE_COUNTS = 'recipe-counts'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+RECIPE_INGREDIENTS = 'recipe-ingredients'
+SIMILAR = 'similar'
+SHORT_LINKS = 'short-links'
+USER_FLAGS = 'user-flags:{}'
+
+RESPONSE_KEY = 'api:response:{}:{}:{}'
+LOCK_KEY = 'api:lock:{}'
+LOCK_POLL_INTERVAL = 0.05
+
+
+def make_response_key(namespace, request, etag=None):
+    params = sorted(request.GET.lists())
+    digest = hashlib.md5(
+        f'{request.path}?{params}{etag}'.encode(), usedforsecurity=False
+    ).hexdigest()
+    return RESPONSE_KEY.format(namespace, get_version(namespace), digest)
+
+
+def get_or_compute(key, compute, timeout):
+    data = cache.get(key)
+    if data is not None:
+        return data
+    lock_key = LOCK_KEY.format(key)
+    lock_timeout = settings.API_CACHE_LOCK_TIMEOUT
+    if not cache.add(lock_key, 1, timeout=lock_timeout):
+        # Ключ уже вычисляет другой запрос: ждем его результат,
+        # а не идем в базу следом за ним.
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            data = cache.get(key)
+            if data is not None:
+                return data
+        return compute()
+    try:
+        data = compute()
+        if data is not None:
+            cache.set(key, data, timeout=timeout)
+        return data
+    finally:
+        cache.delete(lock_key)
+
+
+class CachedReadMixin:
+    cache_namespace = None
+    # Счетчики карточки рецепта двигают ее ETag, но не версию каталога,
+    # поэтому ответ хранится под ETag, посчитанным ConditionalReadMixin.
+    etag = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        responses = []
+
+        def compute():
+            response = handler(request, *args, **kwargs)
+            responses.append(response)
+            if response.status_code != status.HTTP_200_OK:
+                return None
+            return response.data
+
+        data = get_or_compute(
+            make_response_key(self.cache_namespace, request, self.etag),
+            compute,
+            settings.API_CACHE_TIMEOUT,
+        )
+        if responses:
+            return responses[0]
+        return Response(data)
@@ -0,0 +1,114 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+
+from api.cache import RECIPE_COUNTS, RECIPES, USER_FLAGS
+from foodgram_backend.cache import get_version
+from recipes.models import Recipe
+
+
+def make_etag(request, per_user, *parts):
+    user = request.user
+    if per_user and user.is_authenticated:
+        # Флаги is_favorited, is_in_shopping_cart и is_subscribed зависят от
+        # пользователя, а не от версии каталога.
+        parts += (user.pk, get_version(USER_FLAGS.format(user.pk)))
+    return quote_etag(hashlib.md5(
+        repr(parts).encode(), usedforsecurity=False
+    ).hexdigest())
+
+
+def collection_validators(namespace, request, renderer, per_user=False):
+    return make_etag(
+        request, per_user, namespace, get_version(namespace), renderer,
+        request.path, sorted(request.GET.lists())
+    ), None
+
+
+def recipe_list_validators(request, renderer):
+    # Счетчики избранного и корзин меняются чаще каталога и ведут
+    # собственную версию.
+    return make_etag(
+        request, True, RECIPES, get_version(RECIPES),
+        get_version(RECIPE_COUNTS), renderer, request.path,
+        sorted(request.GET.lists())
+    ), None
+
+
+def recipe_validators(request, pk, renderer):
+    try:
+        updated_at = Recipe.objects.filter(pk=pk).values_list(
+            'updated_at', flat=True
+        ).first()
+    except (ValueError, TypeError):
+        updated_at = None
+    if updated_at is None:
+        return None, None
+    # Время изменения рецепта ничего не говорит о флагах пользователя,
+    # поэтому If-Modified-Since проверяем только у анонимных запросов.
+    last_modified = (
+        None if request.user.is_authenticated
+        else int(updated_at.timestamp())
+    )
+    return make_etag(
+        request, True, 'recipe', pk, updated_at.isoformat(), renderer,
+        sorted(request.GET.lists())
+    ), last_modified
+
+
+def set_validators(response, etag, last_modified):
+    if etag is None or response.status_code not in (
+        status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+    ):
+        return response
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def not_modified(request, etag, last_modified):
+    if etag is None:
+        return None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        return None
+    return set_validators(response, etag, last_modified)
+
+
+class ConditionalReadMixin:
+    cache_namespace = None
+    per_user_flags = False
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_validators(self, request, pk):
+        return collection_validators(
+            self.cache_namespace, request, request.accepted_renderer.format,
+            self.per_user_flags
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(
+            request, kwargs.get(self.lookup_field)
+        )
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        self.etag = etag
+        return set_validators(
+            handler(request, *args, **kwargs), etag, last_modified
+        )
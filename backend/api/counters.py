@@ -0,0 +1,47 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from api.cache import RECIPE_COUNTS
+from foodgram_backend.cache import bump_version
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+# Счетчик, модель строк, которые он считает, и поле этих строк,
+# указывающее на владельца счетчика.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta, **fields):
+    return change_counters(model, [pk], field, delta, **fields)
+
+
+def change_counters(model, pks, field, delta, **fields):
+    # Счетчик может отстать от таблицы (каскадное удаление, правки в
+    # админке), поэтому не даем ему уйти ниже нуля до сверки.
+    updated = model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, Value(0))}, **fields
+    )
+    if updated and model is Recipe:
+        # Счетчики рецептов есть в каждой строке списка рецептов.
+        bump_version(RECIPE_COUNTS)
+    return updated
+
+
+def reconcile_counter(model, field, source, foreign_key):
+    actual = Coalesce(Subquery(
+        source.objects.filter(**{foreign_key: OuterRef('pk')})
+        .order_by().values(foreign_key).annotate(total=Count('*'))
+        .values('total')
+    ), Value(0))
+    return model.objects.filter(~Q(**{field: actual})).update(
+        **{field: actual}
+    )
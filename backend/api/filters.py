@@ -1,11 +1,33 @@
 import django_filters
+from django.conf import settings
+from django.db.models import Exists, OuterRef
 
-from recipes.models import Recipe
+from api.cache import TAGS, get_or_compute
+from foodgram_backend.cache import get_version
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
+
+TAG_IDS_KEY = 'api:tag-ids:{}'
+
+
+def get_tag_ids():
+    return get_or_compute(
+        TAG_IDS_KEY.format(get_version(TAGS)),
+        lambda: dict(Tag.objects.values_list('slug', 'id')),
+        settings.API_CACHE_TIMEOUT,
+    )
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = django_filters.MultipleChoiceFilter(
+        choices=get_tag_choices, method='filter_tags'
+    )
     author = django_filters.NumberFilter(field_name='author__id')
+    search = django_filters.CharFilter(method='filter_search')
     is_favorited = django_filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = django_filters.NumberFilter(
         method='filter_is_in_shopping_cart'
@@ -13,7 +35,21 @@ class RecipeFilter(django_filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('is_in_shopping_cart', 'tags', 'author')
+        fields = ('is_in_shopping_cart', 'tags', 'author', 'search')
+
+    def filter_tags(self, queryset, name, value):
+        # Карта могла обновиться после проверки choices: удаленный за это
+        # время тег просто ничего не находит.
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[
+                tag_ids[slug] for slug in value if slug in tag_ids
+            ],
+        )))
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -0,0 +1,130 @@
+import base64
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageFilter, ImageOps
+
+from api.cache import RECIPES
+from foodgram_backend.cache import bump_version
+from foodgram_backend.storage import get_content_storage
+from recipes.models import Recipe
+
+VARIANTS_DIR = 'variants'
+VARIANT_SIZES = {
+    'thumbnail': 160,
+    'card': 480,
+    'detail': 1200,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+VARIANT_QUALITY = 80
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_BLUR_RADIUS = 2
+PLACEHOLDER_QUALITY = 40
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix='image-variants'
+        )
+    return _executor
+
+
+def shutdown_executor():
+    # Дожидается поставленных задач; следующая задача создаст пул заново.
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def encode(image, image_format, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def variant_name(name, variant, extension):
+    return f'{VARIANTS_DIR}/{os.path.splitext(name)[0]}/{variant}.{extension}'
+
+
+def save_variant(name, image, image_format):
+    if not default_storage.exists(name):
+        name = default_storage.save(
+            name, ContentFile(encode(image, image_format, VARIANT_QUALITY))
+        )
+    return name
+
+
+def build_variants(name):
+    with get_content_storage().open(name) as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    variants = {'source': name}
+    for variant, size in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variants[variant] = {
+            key: save_variant(
+                variant_name(name, variant, extension), resized, image_format
+            )
+            for key, (image_format, extension) in VARIANT_FORMATS.items()
+        }
+    placeholder = image.copy()
+    placeholder.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    placeholder = placeholder.filter(
+        ImageFilter.GaussianBlur(PLACEHOLDER_BLUR_RADIUS)
+    )
+    variants['placeholder'] = 'data:image/jpeg;base64,' + base64.b64encode(
+        encode(placeholder, 'JPEG', PLACEHOLDER_QUALITY)
+    ).decode()
+    return variants
+
+
+def delete_variants(name):
+    for variant in VARIANT_SIZES:
+        for _, extension in VARIANT_FORMATS.values():
+            default_storage.delete(variant_name(name, variant, extension))
+
+
+def process_variants(model, pk, field, variants_field, name):
+    try:
+        variants = build_variants(name) if name else {}
+        updated = model.objects.filter(pk=pk, **{field: name}).update(
+            **{variants_field: variants}
+        )
+        if updated:
+            bump_version(RECIPES)
+            Recipe.objects.filter(
+                **{'pk' if model is Recipe else 'author_id': pk}
+            ).touch()
+        if name and not get_content_storage().exists(name):
+            delete_variants(name)
+        return True
+    except Exception:
+        logger.exception('Не удалось подготовить варианты %s', name)
+        return False
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(model, pk, field, variants_field, name):
+    get_executor().submit(
+        process_variants, model, pk, field, variants_field, name
+    )
@@ -0,0 +1,288 @@
+import threading
+from bisect import bisect_left
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.cache import INGREDIENTS, RECIPE_INGREDIENTS
+from foodgram_backend.cache import VERSION_KEY, bump_version, get_version
+from recipes.models import Ingredient, IngredientInRecipe
+from recipes.serializers import IngredientSerializer
+
+MAX_CHAR = '\U0010ffff'
+CHANGE_KEY = 'api:recipe-ingredients:change:{}'
+CHUNK_BITS = 12
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+MAX_CATCH_UP = 1000
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = ((), (), (), ())
+
+    def _refresh(self):
+        version = get_version(INGREDIENTS)
+        if version == self._version:
+            return self._data
+        with self._lock:
+            if version != self._version:
+                rows = tuple(IngredientSerializer(
+                    Ingredient.objects.all(), many=True
+                ).data)
+                names = tuple(row['name'].casefold() for row in rows)
+                order = tuple(sorted(range(len(rows)), key=names.__getitem__))
+                self._data = (
+                    rows, names, tuple(names[i] for i in order), order
+                )
+                self._version = version
+        return self._data
+
+    def search(self, query='', limit=None):
+        rows, names, keys, order = self._refresh()
+        query = query.casefold()
+        if not query:
+            return list(rows[:limit])
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + MAX_CHAR, start)
+        result = [rows[i] for i in sorted(order[start:end])]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        matches = sorted(
+            (name.find(query), i) for i, name in enumerate(names)
+            if query in name and not name.startswith(query)
+        )
+        result.extend(rows[i] for _, i in matches)
+        return result[:limit]
+
+
+ingredient_index = IngredientIndex()
+
+
+class Bitmap:
+    __slots__ = ('chunks',)
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks or {}
+
+    def add(self, value):
+        high = value >> CHUNK_BITS
+        self.chunks[high] = self.chunks.get(high, 0) | (
+            1 << (value & CHUNK_MASK)
+        )
+
+    def discard(self, value):
+        high = value >> CHUNK_BITS
+        chunk = self.chunks.get(high, 0) & ~(1 << (value & CHUNK_MASK))
+        if chunk:
+            self.chunks[high] = chunk
+        else:
+            self.chunks.pop(high, None)
+
+    def _combine(self, other, operation, keep_missing):
+        highs = self.chunks.keys()
+        if keep_missing:
+            highs = highs | other.chunks.keys()
+        chunks = {}
+        for high in highs:
+            chunk = operation(
+                self.chunks.get(high, 0), other.chunks.get(high, 0)
+            )
+            if chunk:
+                chunks[high] = chunk
+        return Bitmap(chunks)
+
+    def __and__(self, other):
+        return self._combine(other, int.__and__, False)
+
+    def __or__(self, other):
+        return self._combine(other, int.__or__, True)
+
+    def __xor__(self, other):
+        return self._combine(other, int.__xor__, True)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b, False)
+
+    def descending(self):
+        for high in sorted(self.chunks, reverse=True):
+            base = high << CHUNK_BITS
+            chunk = self.chunks[high]
+            while chunk:
+                low = chunk.bit_length() - 1
+                yield base + low
+                chunk ^= 1 << low
+
+    def __len__(self):
+        return sum(bin(chunk).count('1') for chunk in self.chunks.values())
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+
+def count_bits(bitmaps):
+    # Поразрядный счетчик: planes[j] содержит рецепты, у которых j-й бит
+    # числа совпавших ингредиентов равен единице.
+    planes = []
+    for bitmap in bitmaps:
+        carry = bitmap
+        for j, plane in enumerate(planes):
+            planes[j], carry = plane ^ carry, plane & carry
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+    return planes
+
+
+def record_recipe_change(recipe_id):
+    try:
+        version = cache.incr(VERSION_KEY.format(RECIPE_INGREDIENTS))
+    except ValueError:
+        bump_version(RECIPE_INGREDIENTS)
+        return
+    cache.set(
+        CHANGE_KEY.format(version), recipe_id, settings.API_CACHE_TIMEOUT
+    )
+
+
+class RecipeIngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._postings = {}
+        self._sizes = {}
+        self._recipes = {}
+
+    def _refresh(self):
+        version = get_version(RECIPE_INGREDIENTS)
+        if version == self._version:
+            return
+        if (
+            self._version is None
+            or not 0 < version - self._version <= MAX_CATCH_UP
+            or not self._catch_up(version)
+        ):
+            self._rebuild(version)
+
+    def _rebuild(self, version):
+        self._postings = {}
+        self._sizes = {}
+        self._recipes = {}
+        rows = IngredientInRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).order_by()
+        recipes = {}
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+        for recipe_id, ingredients in recipes.items():
+            self._add(recipe_id, ingredients)
+        self._version = version
+
+    def _catch_up(self, version):
+        # Изменения других процессов лежат в общем кеше по номерам версий:
+        # если хоть одно уже вытеснено, проще перестроить индекс целиком.
+        keys = [
+            CHANGE_KEY.format(number)
+            for number in range(self._version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        recipe_ids = set(changes.values())
+        recipes = {recipe_id: set() for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id').order_by():
+            recipes[recipe_id].add(ingredient_id)
+        for recipe_id, ingredients in recipes.items():
+            self._remove(recipe_id)
+            if ingredients:
+                self._add(recipe_id, ingredients)
+        self._version = version
+        return True
+
+    def _add(self, recipe_id, ingredients):
+        self._recipes[recipe_id] = frozenset(ingredients)
+        self._sizes.setdefault(len(ingredients), Bitmap()).add(recipe_id)
+        for ingredient_id in ingredients:
+            self._postings.setdefault(ingredient_id, Bitmap()).add(recipe_id)
+
+    def _remove(self, recipe_id):
+        ingredients = self._recipes.pop(recipe_id, None)
+        if ingredients is None:
+            return
+        self._discard(self._sizes, len(ingredients), recipe_id)
+        for ingredient_id in ingredients:
+            self._discard(self._postings, ingredient_id, recipe_id)
+
+    def _discard(self, bitmaps, key, recipe_id):
+        bitmaps[key].discard(recipe_id)
+        if not bitmaps[key]:
+            del bitmaps[key]
+
+    def _levels(self, postings, mode):
+        if mode == 'all':
+            postings = sorted(postings, key=len)
+            found = postings[0]
+            for posting in postings[1:]:
+                found &= posting
+            return {len(postings): found}
+        planes = count_bits(postings)
+        matched = Bitmap()
+        for posting in postings:
+            matched |= posting
+        levels = {}
+        for count in range(min(len(postings), 2 ** len(planes) - 1), 0, -1):
+            level = matched
+            for j, plane in enumerate(planes):
+                level = level & plane if count >> j & 1 else level - plane
+            if level:
+                levels[count] = level
+        return levels
+
+    def _groups(self, levels, mode, max_missing):
+        sizes = sorted(self._sizes)
+        if mode == 'missing':
+            for missing in range(max_missing + 1):
+                for count, level in levels.items():
+                    if count + missing in self._sizes:
+                        yield count, missing, level
+            return
+        for count, level in levels.items():
+            for size in sizes:
+                if size >= count:
+                    yield count, size - count, level
+
+    def search(self, ingredients, mode='all', max_missing=0, limit=None):
+        total = 0
+        results = []
+        with self._lock:
+            self._refresh()
+            postings = [
+                self._postings.get(ingredient_id, Bitmap())
+                for ingredient_id in set(ingredients)
+            ]
+            if not postings:
+                return total, results
+            levels = self._levels(postings, mode)
+            for count, missing, level in self._groups(
+                levels, mode, max_missing
+            ):
+                group = level & self._sizes[count + missing]
+                total += len(group)
+                if limit is None or len(results) < limit:
+                    results.extend(
+                        {'id': recipe_id, 'matched': count,
+                         'missing': missing}
+                        for recipe_id in islice(
+                            group.descending(),
+                            None if limit is None else limit - len(results)
+                        )
+                    )
+        return total, results
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
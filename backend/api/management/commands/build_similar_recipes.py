@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import SIMILAR
+from api.similarity import RecipeVectors, recipe_features
+from foodgram_backend.cache import bump_version
+from recipes.models import Recipe, SimilarRecipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие рецепты для всех рецептов.'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        recipes = Recipe.objects.values('pk')
+        vectors = RecipeVectors(
+            [row['pk'] for row in recipes], *recipe_features(recipes)
+        )
+        with transaction.atomic():
+            SimilarRecipe.objects.all().delete()
+            SimilarRecipe.objects.bulk_create(
+                (
+                    SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                                  score=score)
+                    for recipe_id, similar in vectors.neighbors(
+                        np.arange(len(vectors.recipe_ids)),
+                        settings.SIMILAR_RECIPES_COUNT
+                    )
+                    for similar_id, score in similar
+                ),
+                batch_size=5000
+            )
+        bump_version(SIMILAR)
+        self.stdout.write(
+            f'Рецептов: {len(vectors.recipe_ids)}, '
+            f'время: {time.monotonic() - started:.1f} с.'
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from api.images import process_variants
+from api.signals import IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Готовит уменьшенные варианты изображений рецептов и аватаров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать варианты, даже если они уже готовы.'
+        )
+
+    def handle(self, *args, **options):
+        for model, (field, variants_field) in IMAGE_FIELDS.items():
+            processed = failed = 0
+            rows = list(model.objects.exclude(**{field: ''}).values_list(
+                'pk', field, variants_field
+            ))
+            for pk, name, variants in rows:
+                if not options['force'] and variants.get('source') == name:
+                    continue
+                if process_variants(model, pk, field, variants_field, name):
+                    processed += 1
+                else:
+                    failed += 1
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: обработано {processed}, '
+                f'ошибок {failed}.'
+            )
@@ -0,0 +1,132 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import INGREDIENTS
+from foodgram_backend.cache import bump_version
+from recipes.models import FIELD_MAX_LENGTH, Ingredient
+
+READ_SIZE = 1 << 16
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+        elif row:
+            yield row[0], ''
+
+
+def read_json(file):
+    # Разбираем массив объектов по частям, не читая файл целиком.
+    decoder = json.JSONDecoder()
+    buffer, position, started = '', 0, False
+    while True:
+        chunk = file.read(READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise CommandError('Ожидается JSON-массив ингредиентов.')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Файл JSON оборван или поврежден.')
+                break
+            if not isinstance(item, dict):
+                raise CommandError('Ингредиент в JSON должен быть объектом.')
+            yield item.get('name', ''), item.get('measurement_unit', '')
+        if not chunk:
+            if started:
+                raise CommandError('Файл JSON оборван или поврежден.')
+            return
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV (название, единица измерения) '
+        'или JSON. Уже существующие ингредиенты пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=str(Path(settings.BASE_DIR) / 'data' / 'ingredients.csv'),
+            help='Путь к файлу ingredients.csv или ingredients.json.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько строк вставлять одним запросом.'
+        )
+
+    def save(self, ingredients, batch_size):
+        # Каждая пачка вставляется отдельным запросом, поэтому на работающей
+        # базе не возникает долгих блокировок, а повторный запуск просто
+        # пропускает уже загруженные строки.
+        Ingredient.objects.bulk_create(
+            ingredients, batch_size=batch_size, ignore_conflicts=True
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным.')
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        # С ignore_conflicts база не сообщает, какие строки вставлены,
+        # поэтому добавленные считаем по числу строк до и после загрузки.
+        existing = Ingredient.objects.count()
+        read = skipped = 0
+        with open(path, encoding='utf-8', newline='') as file:
+            ingredients = []
+            for name, unit in reader(file):
+                read += 1
+                name, unit = str(name).strip(), str(unit).strip()
+                if (
+                    not name or not unit
+                    or len(name) > FIELD_MAX_LENGTH
+                    or len(unit) > FIELD_MAX_LENGTH
+                ):
+                    skipped += 1
+                    continue
+                ingredients.append(
+                    Ingredient(name=name, measurement_unit=unit)
+                )
+                if len(ingredients) >= batch_size:
+                    self.save(ingredients, batch_size)
+                    ingredients = []
+            self.save(ingredients, batch_size)
+        created = Ingredient.objects.count() - existing
+        if created:
+            bump_version(INGREDIENTS)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Прочитано {read}, добавлено {created}, '
+            f'пропущено некорректных {skipped}, '
+            f'время: {elapsed:.1f} с '
+            f'({read / max(elapsed, 1e-6):.0f} строк/с).'
+        )
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import RECIPE_COUNTS, RECIPES
+from api.counters import COUNTERS, reconcile_counter
+from foodgram_backend.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики избранного, списков покупок, рецептов '
+        'и подписчиков по таблицам и исправляет разошедшиеся значения.'
+    )
+
+    def handle(self, *args, **options):
+        fixed = 0
+        for model, field, source, foreign_key in COUNTERS:
+            started = time.monotonic()
+            with transaction.atomic():
+                updated = reconcile_counter(model, field, source, foreign_key)
+            fixed += updated
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{field}: исправлено '
+                f'{updated} за {time.monotonic() - started:.1f} с.'
+            )
+        if fixed:
+            bump_version(RECIPES)
+            bump_version(RECIPE_COUNTS)
@@ -0,0 +1,320 @@
+import io
+import time
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.cache import (INGREDIENTS, RECIPE_INGREDIENTS, RECIPES, SIMILAR,
+                       TAGS)
+from api.images import build_variants
+from foodgram_backend.cache import bump_version
+from foodgram_backend.storage import get_content_storage
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem, StoredFile, Tag)
+from recipes.search import index_recipes
+from users.models import Subscription, User
+
+PASSWORD = 'seed-password'
+TAGS_DATA = (
+    ('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'),
+    ('Десерт', 'dessert'), ('Выпечка', 'bakery'), ('Напитки', 'drinks'),
+)
+DISHES = (
+    'суп', 'салат', 'пирог', 'омлет', 'рагу', 'каша', 'запеканка',
+    'паста', 'плов', 'торт', 'блины', 'котлеты',
+)
+STYLES = (
+    'домашний', 'быстрый', 'летний', 'острый', 'сливочный', 'овощной',
+    'бабушкин', 'праздничный',
+)
+PLACEHOLDER_COLORS = (
+    '#e07a5f', '#f2cc8f', '#81b29a', '#3d405b', '#f4f1de', '#6d597a',
+    '#b56576', '#eaac8b',
+)
+MIN_INGREDIENTS = 100
+AUTHOR_SKEW = 1.2
+RECIPE_SKEW = 1.0
+INGREDIENT_SKEW = 0.8
+# Число избранного, корзин и подписок на пользователя распределено
+# логнормально: у большинства немного, у немногих — очень много.
+LONG_TAIL_SIGMA = 1.2
+SHOPPING_LIST_USERS = 500
+
+
+def popularity(generator, size, skew):
+    weights = 1 / (generator.permutation(size) + 1) ** skew
+    return weights / weights.sum()
+
+
+def long_tail(generator, size, mean, limit):
+    counts = generator.lognormal(
+        np.log(max(mean, 1e-9)) - LONG_TAIL_SIGMA ** 2 / 2,
+        LONG_TAIL_SIGMA, size
+    )
+    return np.minimum(np.rint(counts).astype(np.int64), limit)
+
+
+def unique_pairs(first, second):
+    pairs = np.unique(np.column_stack([first, second]), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def placeholder(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (320, 240), color).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает синтетических пользователей, рецепты, избранное, корзины '
+        'и подписки с неравномерными распределениями для нагрузочных '
+        'проверок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument(
+            '--ingredients-per-recipe', type=float, default=8
+        )
+        parser.add_argument('--favorites-per-user', type=float, default=30)
+        parser.add_argument('--carts-per-user', type=float, default=4)
+        parser.add_argument(
+            '--subscriptions-per-user', type=float, default=5
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имен создаваемых пользователей.'
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--tokens', action='store_true',
+            help='Выдать пользователям токены авторизации.'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и рецепт.')
+        if User.objects.filter(
+            username=f'{options["prefix"]}0'
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]} уже есть.'
+            )
+        self.batch_size = options['batch_size']
+        self.use_copy = connection.vendor == 'postgresql'
+        started = time.monotonic()
+        if Ingredient.objects.count() < MIN_INGREDIENTS:
+            call_command('load_ingredients', stdout=io.StringIO())
+        generator = np.random.default_rng(options['seed'])
+        with transaction.atomic():
+            self.seed(generator, options)
+        # Данные пишутся в обход представлений, которые ведут счетчики.
+        call_command('reconcile_counters', stdout=self.stdout)
+        for namespace in (
+            RECIPES, TAGS, INGREDIENTS, RECIPE_INGREDIENTS, SIMILAR
+        ):
+            bump_version(namespace)
+        self.stdout.write(
+            f'Готово за {time.monotonic() - started:.1f} с. Похожие рецепты '
+            'пересчитываются командой build_similar_recipes.'
+        )
+
+    def seed(self, generator, options):
+        user_ids = np.array(self.create_users(options), dtype=np.int64)
+        tag_ids = np.array([
+            Tag.objects.get_or_create(slug=slug, defaults={'name': name})[0].id
+            for name, slug in TAGS_DATA
+        ], dtype=np.int64)
+        ingredient_ids = np.array(
+            Ingredient.objects.order_by('id').values_list('id', flat=True),
+            dtype=np.int64
+        )
+        author_popularity = popularity(generator, len(user_ids), AUTHOR_SKEW)
+        recipe_ids = np.array(
+            self.create_recipes(
+                generator, user_ids, author_popularity, options
+            ),
+            dtype=np.int64
+        )
+        recipes = len(recipe_ids)
+
+        counts = np.clip(
+            generator.poisson(options['ingredients_per_recipe'], recipes),
+            1, len(ingredient_ids)
+        )
+        recipe_column, ingredient_column = unique_pairs(
+            np.repeat(recipe_ids, counts),
+            generator.choice(
+                ingredient_ids, counts.sum(),
+                p=popularity(generator, len(ingredient_ids), INGREDIENT_SKEW)
+            )
+        )
+        self.write(IngredientInRecipe, (
+            'recipe_id', 'ingredient_id', 'amount'
+        ), (
+            recipe_column, ingredient_column,
+            generator.integers(1, 500, len(recipe_column))
+        ))
+
+        counts = generator.integers(1, 4, recipes)
+        self.write(Recipe.tags.through, ('recipe_id', 'tag_id'), unique_pairs(
+            np.repeat(recipe_ids, counts),
+            generator.choice(tag_ids, counts.sum())
+        ))
+
+        recipe_popularity = popularity(generator, recipes, RECIPE_SKEW)
+        for model, mean in (
+            (Favorite, options['favorites_per_user']),
+            (ShoppingCart, options['carts_per_user']),
+        ):
+            counts = long_tail(generator, len(user_ids), mean, recipes)
+            self.write(model, ('user_id', 'recipe_id'), unique_pairs(
+                np.repeat(user_ids, counts),
+                generator.choice(recipe_ids, counts.sum(), p=recipe_popularity)
+            ))
+
+        counts = long_tail(
+            generator, len(user_ids), options['subscriptions_per_user'],
+            len(user_ids) - 1
+        )
+        followers, authors = unique_pairs(
+            np.repeat(user_ids, counts),
+            generator.choice(user_ids, counts.sum(), p=author_popularity)
+        )
+        own = followers == authors
+        self.write(Subscription, ('user_id', 'author_id'), (
+            followers[~own], authors[~own]
+        ))
+        self.fill_shopping_lists(user_ids)
+
+    def create_users(self, options):
+        password = make_password(PASSWORD)
+        prefix = options['prefix']
+        user_ids = []
+        for start in range(0, options['users'], self.batch_size):
+            users = User.objects.bulk_create(
+                User(
+                    username=f'{prefix}{i}', email=f'{prefix}{i}@example.com',
+                    first_name='Пользователь', last_name=str(i),
+                    password=password
+                )
+                for i in range(
+                    start, min(start + self.batch_size, options['users'])
+                )
+            )
+            if options['tokens']:
+                Token.objects.bulk_create(
+                    Token(key=Token.generate_key(), user=user)
+                    for user in users
+                )
+            user_ids.extend(user.id for user in users)
+        self.report(User, len(user_ids))
+        return user_ids
+
+    def create_recipes(self, generator, user_ids, author_popularity,
+                       options):
+        images = []
+        for color in PLACEHOLDER_COLORS:
+            name = get_content_storage().save(
+                'recipes/images/placeholder.png', placeholder(color)
+            )
+            images.append((name, build_variants(name)))
+        recipes = options['recipes']
+        authors = generator.choice(user_ids, recipes, p=author_popularity)
+        image_indexes = generator.integers(0, len(images), recipes)
+        names = generator.integers(0, len(DISHES) * len(STYLES), recipes)
+        words = DISHES + STYLES
+        texts = generator.integers(0, len(words), (recipes, 20))
+        cooking_times = generator.integers(5, 181, recipes)
+        recipe_ids = []
+        for start in range(0, recipes, self.batch_size):
+            created = Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=int(authors[i]),
+                    name=f'{STYLES[names[i] % len(STYLES)].capitalize()} '
+                         f'{DISHES[names[i] // len(STYLES)]} №{i}',
+                    text=' '.join(words[word] for word in texts[i]),
+                    cooking_time=int(cooking_times[i]),
+                    image=images[image_indexes[i]][0],
+                    image_variants=images[image_indexes[i]][1],
+                )
+                for i in range(start, min(start + self.batch_size, recipes))
+            )
+            index_recipes(created)
+            recipe_ids.extend(recipe.id for recipe in created)
+        for index, (name, _) in enumerate(images):
+            stored_file, _ = StoredFile.objects.get_or_create(name=name)
+            StoredFile.objects.filter(pk=stored_file.pk).update(
+                references=F('references')
+                + int((image_indexes == index).sum())
+            )
+        self.report(Recipe, len(recipe_ids))
+        return recipe_ids
+
+    def write(self, model, fields, columns):
+        started = time.monotonic()
+        rows = np.column_stack(columns)
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        names = ', '.join(
+            quote(model._meta.get_field(field).column) for field in fields
+        )
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size].tolist()
+                if self.use_copy:
+                    data = '\n'.join('\t'.join(map(str, row)) for row in batch)
+                    cursor.cursor.copy_expert(
+                        f'COPY {table} ({names}) FROM STDIN',
+                        io.StringIO(data)
+                    )
+                else:
+                    cursor.executemany(
+                        f'INSERT INTO {table} ({names}) VALUES '
+                        f'({", ".join(["%s"] * len(fields))})',
+                        batch
+                    )
+        self.report(model, len(rows), started)
+
+    def fill_shopping_lists(self, user_ids):
+        started = time.monotonic()
+        quote = connection.ops.quote_name
+        items = quote(ShoppingListItem._meta.db_table)
+        carts = quote(ShoppingCart._meta.db_table)
+        amounts = quote(IngredientInRecipe._meta.db_table)
+        created = 0
+        with connection.cursor() as cursor:
+            for start in range(0, len(user_ids), SHOPPING_LIST_USERS):
+                batch = user_ids[start:start + SHOPPING_LIST_USERS].tolist()
+                cursor.execute(
+                    f'INSERT INTO {items} (user_id, ingredient_id, '
+                    'total_amount) '
+                    f'SELECT c.user_id, a.ingredient_id, SUM(a.amount) '
+                    f'FROM {carts} c JOIN {amounts} a '
+                    'ON a.recipe_id = c.recipe_id '
+                    f'WHERE c.user_id IN ({", ".join(["%s"] * len(batch))}) '
+                    'GROUP BY c.user_id, a.ingredient_id',
+                    batch
+                )
+                created += cursor.rowcount
+        self.report(ShoppingListItem, created, started)
+
+    def report(self, model, count, started=None):
+        message = f'{model._meta.verbose_name_plural}: {count}'
+        if started is not None:
+            elapsed = time.monotonic() - started
+            message += (
+                f' за {elapsed:.1f} с ({count / max(elapsed, 1e-6):.0f} '
+                'строк/с)'
+            )
+        self.stdout.write(message + '.')
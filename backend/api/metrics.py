@@ -0,0 +1,233 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+UNMATCHED = 'unmatched'
+
+current_request = ContextVar('current_request', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'sql_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+def install_wrapper(connection, **kwargs):
+    # Обертка ставится на само соединение, а не на время запроса: запросы
+    # асинхронных представлений выполняются в других потоках, но контекст
+    # (и с ним current_request) туда копируется.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, view, method, duration, stats):
+        bucket = bisect_left(LATENCY_BUCKETS, duration)
+        with self._lock:
+            entry = self._entries.get((view, method))
+            if entry is None:
+                entry = self._entries[(view, method)] = [
+                    0, 0.0, 0, 0.0, [0] * (len(LATENCY_BUCKETS) + 1)
+                ]
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] += stats.queries
+            entry[3] += stats.sql_time
+            entry[4][bucket] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: (*entry[:4], list(entry[4]))
+                for key, entry in self._entries.items()
+            }
+
+    def render(self):
+        entries = sorted(self.snapshot().items())
+        lines = []
+
+        def family(name, kind, description):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        family(
+            'http_requests_total', 'counter', 'Число обработанных запросов.'
+        )
+        for (view, method), entry in entries:
+            lines.append(
+                f'http_requests_total{labels(view, method)} {entry[0]}'
+            )
+        family(
+            'http_request_duration_seconds', 'histogram',
+            'Время обработки запроса.'
+        )
+        for (view, method), entry in entries:
+            total = 0
+            for bound, count in zip(
+                (*LATENCY_BUCKETS, '+Inf'), entry[4]
+            ):
+                total += count
+                lines.append(
+                    'http_request_duration_seconds_bucket'
+                    f'{labels(view, method, le=bound)} {total}'
+                )
+            lines.append(
+                'http_request_duration_seconds_sum'
+                f'{labels(view, method)} {entry[1]}'
+            )
+            lines.append(
+                'http_request_duration_seconds_count'
+                f'{labels(view, method)} {entry[0]}'
+            )
+        family(
+            'db_queries_total', 'counter',
+            'Число SQL-запросов, выполненных при обработке запросов.'
+        )
+        for (view, method), entry in entries:
+            lines.append(f'db_queries_total{labels(view, method)} {entry[2]}')
+        family(
+            'db_query_duration_seconds_total', 'counter',
+            'Суммарное время SQL-запросов.'
+        )
+        for (view, method), entry in entries:
+            lines.append(
+                'db_query_duration_seconds_total'
+                f'{labels(view, method)} {entry[3]}'
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def labels(view, method, **extra):
+    pairs = {'view': view, 'method': method, **extra}
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in pairs.items()
+    ) + '}'
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_wrapper)
+        for connection in connections.all(initialized_only=True):
+            install_wrapper(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, started, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, started, stats)
+
+    def finish(self, request, response, started, stats):
+        # Потоковые ответы (список покупок) читают базу уже после выхода из
+        # middleware, поэтому учитываем их по окончании передачи.
+        if not response.streaming:
+            self.record(request, time.perf_counter() - started, stats)
+        elif response.is_async:
+            response.streaming_content = self.astream(
+                response.streaming_content, request, started, stats
+            )
+        else:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, started, stats
+            )
+        return response
+
+    def stream(self, content, request, started, stats):
+        iterator = iter(content)
+        try:
+            while True:
+                token = current_request.set(stats)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    current_request.reset(token)
+                yield chunk
+        finally:
+            self.record(request, time.perf_counter() - started, stats)
+
+    async def astream(self, content, request, started, stats):
+        iterator = content.__aiter__()
+        try:
+            while True:
+                token = current_request.set(stats)
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    current_request.reset(token)
+                yield chunk
+        finally:
+            self.record(request, time.perf_counter() - started, stats)
+
+    def record(self, request, duration, stats):
+        match = request.resolver_match
+        metrics.record(
+            match.view_name if match else UNMATCHED,
+            request.method, duration, stats
+        )
@@ -0,0 +1,133 @@
+import atexit
+import secrets
+import string
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+
+from api.cache import SHORT_LINKS
+from foodgram_backend.cache import get_version
+from recipes.models import Recipe, ShortLink
+
+ALPHABET = string.digits + string.ascii_letters
+CREATE_ATTEMPTS = 5
+
+
+def generate_code():
+    return ''.join(
+        secrets.choice(ALPHABET) for _ in range(settings.SHORT_LINK_LENGTH)
+    )
+
+
+class ShortLinkCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != generation:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _store(self, generation, recipe_id, code):
+        with self._lock:
+            for key, value in (
+                (('code', code), recipe_id), (('recipe', recipe_id), code)
+            ):
+                self._entries[key] = (generation, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > settings.SHORT_LINK_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def resolve(self, code):
+        generation = get_version(SHORT_LINKS)
+        recipe_id = self._get(('code', code), generation)
+        if recipe_id is None:
+            recipe_id = ShortLink.objects.filter(code=code).values_list(
+                'recipe_id', flat=True
+            ).first()
+            if recipe_id is None:
+                return None
+            self._store(generation, recipe_id, code)
+        return recipe_id
+
+    def get_code(self, recipe_id):
+        generation = get_version(SHORT_LINKS)
+        code = self._get(('recipe', recipe_id), generation)
+        if code is None:
+            code = ShortLink.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('code', flat=True).first()
+            if code is None:
+                if not Recipe.objects.filter(pk=recipe_id).exists():
+                    return None
+                code = self._create(recipe_id)
+            self._store(generation, recipe_id, code)
+        return code
+
+    def _create(self, recipe_id):
+        for _ in range(CREATE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    return ShortLink.objects.create(
+                        recipe_id=recipe_id, code=generate_code()
+                    ).code
+            except IntegrityError:
+                # Либо совпал код, либо ссылку на этот рецепт только что
+                # создал параллельный запрос.
+                code = ShortLink.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list('code', flat=True).first()
+                if code is not None:
+                    return code
+        raise IntegrityError('Не удалось подобрать свободный код ссылки')
+
+
+class HitCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+
+    def add(self, code):
+        with self._lock:
+            self._hits[code] += 1
+            self._pending += 1
+            due = (
+                self._pending >= settings.SHORT_LINK_HITS_FLUSH_SIZE
+                or time.monotonic() - self._flushed_at
+                >= settings.SHORT_LINK_HITS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+            self._pending = 0
+            self._flushed_at = time.monotonic()
+        if not hits:
+            return
+        ShortLink.objects.filter(code__in=hits).update(
+            hits=F('hits') + Case(
+                *(When(code=code, then=Value(count))
+                  for code, count in hits.items()),
+                default=Value(0)
+            )
+        )
+
+
+short_links = ShortLinkCache()
+hit_counter = HitCounter()
+atexit.register(hit_counter.flush)
@@ -0,0 +1,397 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save, pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.cache import INGREDIENTS, RECIPES, SHORT_LINKS, TAGS, USER_FLAGS
+from api.counters import RECIPE_COUNTERS, change_counter, change_counters
+from api.images import delete_variants, schedule_variants
+from api.indexes import record_recipe_change
+from api.similarity import schedule_similar_refresh
+from foodgram_backend.cache import bump_version
+from foodgram_backend.storage import get_content_storage
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem, ShortLink,
+                            SimilarRecipe, Tag)
+from recipes.search import index_recipe, unindex_recipe
+from users.authentication import token_cache
+from users.models import Subscription, User
+
+INVALIDATED_NAMESPACES = {
+    Recipe: (RECIPES,),
+    IngredientInRecipe: (RECIPES,),
+    Tag: (TAGS, RECIPES),
+    Ingredient: (INGREDIENTS, RECIPES),
+}
+IMAGE_FIELDS = {
+    Recipe: ('image', 'image_variants'),
+    User: ('avatar', 'avatar_variants'),
+}
+AUTHOR_FIELDS = {
+    'email', 'username', 'first_name', 'last_name', 'avatar',
+    'avatar_variants',
+}
+
+
+def invalidate_catalog(sender, **kwargs):
+    bump_version(*INVALIDATED_NAMESPACES[sender])
+
+
+for model in INVALIDATED_NAMESPACES:
+    post_save.connect(invalidate_catalog, sender=model)
+    post_delete.connect(invalidate_catalog, sender=model)
+
+
+def touch_recipes_on_commit(**lookup):
+    transaction.on_commit(lambda: Recipe.objects.filter(**lookup).touch())
+
+
+def touch_related_recipes(lookup, instance, created, signal):
+    if created:
+        return
+    if signal is pre_delete:
+        # После COMMIT связей удаленного объекта уже нет.
+        touch_recipes_on_commit(pk__in=list(Recipe.objects.filter(
+            **{lookup: instance}
+        ).values_list('pk', flat=True)))
+        return
+    touch_recipes_on_commit(**{lookup: instance.pk})
+
+
+# Рецепты отдаются с ETag по времени изменения, поэтому правка тега или
+# ингредиента должна сдвинуть его у всех рецептов, где они встречаются.
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tagged_recipes(sender, instance, signal, created=False, **kwargs):
+    touch_related_recipes('tags', instance, created, signal)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_with_ingredient(sender, instance, signal, created=False,
+                                  **kwargs):
+    touch_related_recipes('ingredients', instance, created, signal)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_version(RECIPES)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def update_recipe_ingredient_index(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: record_recipe_change(recipe_id))
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def update_ingredient_amount_index(sender, instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: record_recipe_change(recipe_id))
+
+
+def refresh_similar_on_commit(recipe_ids):
+    transaction.on_commit(lambda: schedule_similar_refresh(recipe_ids))
+
+
+# Ингредиенты и теги меняются вместе с сохранением рецепта (и в API,
+# и в админке), поэтому отдельные сигналы на них не нужны.
+@receiver(post_save, sender=Recipe)
+def refresh_similar_recipes(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_similar_on_commit([instance.pk])
+
+
+@receiver(pre_delete, sender=Recipe)
+def refresh_similar_listers(sender, instance, **kwargs):
+    refresh_similar_on_commit(list(SimilarRecipe.objects.filter(
+        similar=instance
+    ).values_list('recipe_id', flat=True)))
+
+
+RELATION_FIELDS = {
+    Favorite: ('user_id', 'recipe_id'),
+    ShoppingCart: ('user_id', 'recipe_id'),
+    Subscription: ('user_id', 'author_id'),
+}
+SHOPPING_LIST_SHARES = {
+    IngredientInRecipe: ('recipe_id', 'ingredient_id', 'amount'),
+}
+
+collected_relations = ContextVar('collected_relations', default=None)
+
+
+def deleted_directly(sender, origin):
+    # При каскадном удалении рецепта, пользователя или ингредиента списки
+    # покупок поправляют обработчики самого удаляемого объекта.
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is sender
+
+
+def cart_users(recipe_id):
+    return list(ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+        'user_id', flat=True
+    ))
+
+
+def shift_recipe_ingredient(recipe_id, ingredient_id, delta):
+    ShoppingListItem.objects.apply_deltas(
+        cart_users(recipe_id), {ingredient_id: delta}
+    )
+
+
+def stored_values(instance, fields):
+    if instance.pk is None or not all(
+        field in instance.__dict__ for field in fields
+    ):
+        return None
+    return tuple(instance.__dict__[field] for field in fields)
+
+
+@receiver(post_init, sender=IngredientInRecipe)
+def remember_shopping_list_share(sender, instance, **kwargs):
+    instance._stored_share = stored_values(
+        instance, SHOPPING_LIST_SHARES[sender]
+    )
+
+
+def relations_changed(model, user_id, target_ids, sign, shopping_list=True):
+    # Последствия добавления (sign=1) и удаления (sign=-1) строк избранного,
+    # корзины или подписок: одиночные изменения приходят сюда из сигналов,
+    # пакетные — один раз на всю пачку.
+    bump_version(USER_FLAGS.format(user_id))
+    if model is Subscription:
+        change_counters(User, target_ids, 'subscribers_count', sign)
+        return
+    # Счетчики есть в карточке рецепта, поэтому сдвигаем и время
+    # изменения, по которому строится ETag.
+    change_counters(
+        Recipe, target_ids, RECIPE_COUNTERS[model], sign,
+        updated_at=timezone.now()
+    )
+    if model is Favorite:
+        refresh_similar_on_commit(list(target_ids))
+    elif shopping_list:
+        ShoppingListItem.objects.add_recipes([user_id], target_ids, sign)
+
+
+def relation_changed(model, user_id, target_id, sign, shopping_list=True):
+    changes = collected_relations.get()
+    if changes is None:
+        relations_changed(model, user_id, [target_id], sign, shopping_list)
+        return
+    changes.setdefault(
+        (model, user_id, sign, shopping_list), []
+    ).append(target_id)
+
+
+@contextmanager
+def collect_relations():
+    # Внутри блока сигналы только копят изменения, а последствия
+    # применяются при выходе одним вызовом на пользователя.
+    changes = {}
+    token = collected_relations.set(changes)
+    try:
+        yield
+    finally:
+        collected_relations.reset(token)
+    for (model, user_id, sign, shopping_list), target_ids in changes.items():
+        relations_changed(model, user_id, target_ids, sign, shopping_list)
+
+
+@receiver(post_init, sender=Favorite)
+@receiver(post_init, sender=ShoppingCart)
+@receiver(post_init, sender=Subscription)
+def remember_relation(sender, instance, **kwargs):
+    instance._stored_relation = stored_values(
+        instance, RELATION_FIELDS[sender]
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+def count_saved_relation(sender, instance, created, raw=False, **kwargs):
+    stored = instance._stored_relation
+    relation = tuple(
+        getattr(instance, field) for field in RELATION_FIELDS[sender]
+    )
+    instance._stored_relation = relation
+    if raw or stored == relation or not created and stored is None:
+        return
+    if stored is not None:
+        relation_changed(sender, *stored, -1)
+    relation_changed(sender, *relation, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def count_deleted_relation(sender, instance, origin=None, **kwargs):
+    user_field, target_field = RELATION_FIELDS[sender]
+    relation_changed(
+        sender, getattr(instance, user_field),
+        getattr(instance, target_field), -1,
+        shopping_list=deleted_directly(sender, origin)
+    )
+
+
+@receiver(post_init, sender=Recipe)
+def remember_author(sender, instance, **kwargs):
+    stored = stored_values(instance, ('author_id',))
+    instance._stored_author = None if stored is None else stored[0]
+
+
+@receiver(post_save, sender=Recipe)
+def count_author_recipes(sender, instance, created, raw=False, **kwargs):
+    stored = instance._stored_author
+    instance._stored_author = instance.author_id
+    if raw or stored == instance.author_id or not created and stored is None:
+        return
+    if stored is not None:
+        change_counter(User, stored, 'recipes_count', -1)
+    change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_author_recipe(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def update_shopping_list_by_amount(sender, instance, created, raw=False,
+                                   **kwargs):
+    stored = instance._stored_share
+    share = (instance.recipe_id, instance.ingredient_id, instance.amount)
+    instance._stored_share = share
+    if raw or stored == share or not created and stored is None:
+        return
+    if stored is not None and stored[:2] == share[:2]:
+        shift_recipe_ingredient(*share[:2], share[2] - stored[2])
+        return
+    if stored is not None:
+        shift_recipe_ingredient(*stored[:2], -stored[2])
+    shift_recipe_ingredient(*share)
+
+
+@receiver(post_delete, sender=IngredientInRecipe)
+def remove_amount_from_shopping_list(sender, instance, origin=None,
+                                     **kwargs):
+    if deleted_directly(sender, origin):
+        shift_recipe_ingredient(
+            instance.recipe_id, instance.ingredient_id, -instance.amount
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    ShoppingListItem.objects.remove_recipe(
+        cart_users(instance.pk), instance.pk
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_index(sender, instance, **kwargs):
+    index_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_recipe(instance)
+
+
+@receiver(post_delete, sender=ShortLink)
+def invalidate_short_links(sender, **kwargs):
+    bump_version(SHORT_LINKS)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_recipe_authors(sender, instance, signal, update_fields=None,
+                              **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    # Рецепты удаленного автора уходят вместе с ним, а если сохранялись
+    # только поля, которых нет в карточке рецепта, трогать их незачем.
+    if signal is post_save and (
+        not update_fields or AUTHOR_FIELDS.intersection(update_fields)
+    ):
+        bump_version(RECIPES)
+        touch_recipes_on_commit(author_id=instance.pk)
+    elif signal is post_delete:
+        bump_version(RECIPES)
+    token_cache.invalidate(
+        Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.invalidate([instance.key])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    field, variants_field = IMAGE_FIELDS[sender]
+    name = getattr(instance, field).name or ''
+    if getattr(instance, variants_field).get('source', '') == name:
+        return
+    transaction.on_commit(lambda: schedule_variants(
+        sender, instance.pk, field, variants_field, name
+    ))
+
+
+def delete_orphan_variants(name):
+    # Файл удаляется после COMMIT и только если его не сохранили заново.
+    if not get_content_storage().exists(name):
+        delete_variants(name)
+
+
+def release_file(name):
+    if name and get_content_storage().release(name):
+        transaction.on_commit(lambda: delete_orphan_variants(name))
+
+
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=User)
+def remember_file(sender, instance, **kwargs):
+    field, _ = IMAGE_FIELDS[sender]
+    if field not in instance.__dict__:
+        instance._stored_file = None
+        return
+    value = instance.__dict__[field]
+    instance._stored_file = value if isinstance(value, str) else ''
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def count_file_references(sender, instance, raw=False, **kwargs):
+    if raw or instance._stored_file is None:
+        return
+    field, _ = IMAGE_FIELDS[sender]
+    name = getattr(instance, field).name or ''
+    if name == instance._stored_file:
+        return
+    if name:
+        get_content_storage().retain(name)
+    release_file(instance._stored_file)
+    instance._stored_file = name
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def release_file_reference(sender, instance, **kwargs):
+    if instance._stored_file is not None:
+        release_file(instance._stored_file)
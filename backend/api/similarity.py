@@ -0,0 +1,314 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count, Q
+from scipy import sparse
+
+from api.cache import SIMILAR
+from foodgram_backend.cache import bump_version
+from recipes.models import Favorite, IngredientInRecipe, Recipe, SimilarRecipe
+
+FAVORITE_WEIGHT = 0.5
+TAG_WEIGHT = 0.3
+COMMON_FEATURE_SHARE = 0.05
+MIN_COMMON_FEATURE_COUNT = 50
+MAX_COMMON_FEATURE_COUNT = 1000
+MAX_TAG_SETS = 2048
+BLOCK_SIZE = 256
+ID_BATCH_SIZE = 900
+INGREDIENT, FAVORITE = 0, 1
+
+SIMILAR_KEY = 'api:similar:{}:{}:{}'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def as_pairs(pairs):
+    return np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+
+
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def is_common(frequency, document_count):
+    return frequency > min(
+        max(COMMON_FEATURE_SHARE * document_count, MIN_COMMON_FEATURE_COUNT),
+        MAX_COMMON_FEATURE_COUNT
+    )
+
+
+class RecipeVectors:
+    def __init__(self, recipe_ids, ingredients, favorites, tags,
+                 document_count=None, frequencies=None):
+        self.recipe_ids = np.unique(np.asarray(recipe_ids, dtype=np.int64))
+        ingredients, favorites, tags = (
+            as_pairs(ingredients), as_pairs(favorites), as_pairs(tags)
+        )
+        if document_count is None:
+            document_count = len(self.recipe_ids)
+        rows = self.rows(np.concatenate([ingredients[:, 0], favorites[:, 0]]))
+        keys = np.concatenate([
+            ingredients[:, 1] * 2 + INGREDIENT,
+            favorites[:, 1] * 2 + FAVORITE,
+        ])
+        features, columns = np.unique(keys, return_inverse=True)
+        if frequencies is None:
+            frequency = np.bincount(columns, minlength=len(features))
+        else:
+            frequency = np.array(
+                [frequencies.get(key, 1) for key in features.tolist()],
+                dtype=np.int64
+            )
+        weights = np.log((1 + document_count) / (1 + frequency)) + 1
+        weights[features % 2 == FAVORITE] *= FAVORITE_WEIGHT
+        matrix = normalize_rows(sparse.csr_matrix(
+            (weights[columns], (rows, columns)),
+            shape=(len(self.recipe_ids), len(features))
+        )).tocsr()
+        # Слишком частые признаки (соль, популярные у всех рецепты) почти
+        # не различают рецепты, но делают произведение матриц плотным.
+        matrix.data[is_common(frequency, document_count)[matrix.indices]] = 0
+        matrix.eliminate_zeros()
+        self.matrix = matrix
+        self.transposed = matrix.T.tocsr()
+        tag_ids, tag_columns = np.unique(tags[:, 1], return_inverse=True)
+        tag_matrix = np.zeros((len(self.recipe_ids), len(tag_ids)), dtype=bool)
+        tag_matrix[self.rows(tags[:, 0]), tag_columns] = True
+        tag_sets, self.tag_sets = np.unique(
+            tag_matrix, axis=0, return_inverse=True
+        )
+        tag_sets = tag_sets.astype(np.float32)
+        norms = np.linalg.norm(tag_sets, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.tag_vectors = tag_sets / norms
+        # Обычно наборов тегов намного меньше, чем рецептов: тогда сходство
+        # считаем один раз для каждой пары наборов.
+        self.tag_similarity = None
+        if len(tag_sets) <= MAX_TAG_SETS:
+            self.tag_similarity = self.tag_vectors @ self.tag_vectors.T
+
+    def rows(self, recipe_ids):
+        return np.searchsorted(self.recipe_ids, recipe_ids)
+
+    def combine(self, scores, rows, columns):
+        rows, columns = self.tag_sets[rows], self.tag_sets[columns]
+        if self.tag_similarity is not None:
+            tag_scores = self.tag_similarity[rows, columns]
+        else:
+            tag_scores = (
+                self.tag_vectors[rows] * self.tag_vectors[columns]
+            ).sum(axis=-1)
+        return (scores + TAG_WEIGHT * tag_scores) / (1 + TAG_WEIGHT)
+
+    def neighbors(self, rows, count):
+        for start in range(0, len(rows), BLOCK_SIZE):
+            block = rows[start:start + BLOCK_SIZE]
+            product = (self.matrix[block] @ self.transposed).tocsr()
+            for i, row in enumerate(block):
+                begin, end = product.indptr[i], product.indptr[i + 1]
+                columns = product.indices[begin:end]
+                keep = columns != row
+                columns = columns[keep]
+                scores = self.combine(
+                    product.data[begin:end][keep], row, columns
+                )
+                if len(columns) > count:
+                    top = np.argpartition(-scores, count - 1)[:count]
+                    columns, scores = columns[top], scores[top]
+                order = np.lexsort((-self.recipe_ids[columns], -scores))
+                yield int(self.recipe_ids[row]), [
+                    (int(self.recipe_ids[column]), float(score))
+                    for column, score in zip(columns[order], scores[order])
+                ]
+
+    def pair_scores(self, rows, others):
+        product = (self.matrix[rows] @ self.transposed[:, others]).tocoo()
+        return product.row, product.col, self.combine(
+            product.data, rows[product.row], others[product.col]
+        )
+
+
+def recipe_features(recipes):
+    return (
+        IngredientInRecipe.objects.filter(recipe_id__in=recipes).values_list(
+            'recipe_id', 'ingredient_id'
+        ).order_by(),
+        Favorite.objects.filter(recipe_id__in=recipes).values_list(
+            'recipe_id', 'user_id'
+        ).order_by(),
+        Recipe.tags.through.objects.filter(recipe_id__in=recipes).values_list(
+            'recipe_id', 'tag_id'
+        ).order_by(),
+    )
+
+
+def feature_frequencies(recipes):
+    frequencies = {}
+    for model, field, kind in (
+        (IngredientInRecipe, 'ingredient_id', INGREDIENT),
+        (Favorite, 'user_id', FAVORITE),
+    ):
+        frequencies.update(
+            (feature_id * 2 + kind, count)
+            for feature_id, count in model.objects.filter(**{
+                f'{field}__in': model.objects.filter(
+                    recipe_id__in=recipes
+                ).values(field)
+            }).values(field).annotate(count=Count('id')).values_list(
+                field, 'count'
+            ).order_by()
+        )
+    return frequencies
+
+
+def batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), ID_BATCH_SIZE):
+        yield ids[start:start + ID_BATCH_SIZE]
+
+
+def save_neighbors(neighbors):
+    with transaction.atomic():
+        for batch in batches(neighbors):
+            SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+        SimilarRecipe.objects.bulk_create(
+            (
+                SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                              score=score)
+                for recipe_id, similar in neighbors.items()
+                for similar_id, score in similar
+            ),
+            batch_size=1000
+        )
+
+
+def refresh_similar_recipes(recipe_ids):
+    count = settings.SIMILAR_RECIPES_COUNT
+    changed = set(Recipe.objects.filter(
+        pk__in=recipe_ids
+    ).values_list('pk', flat=True))
+    # Рецепты, в чьих списках стоят измененные, пересчитываем полностью:
+    # их сходство могло уменьшиться, и на освободившееся место нужен
+    # следующий по порядку кандидат.
+    targets = changed | set(SimilarRecipe.objects.filter(
+        similar_id__in=changed
+    ).values_list('recipe_id', flat=True))
+    if not targets:
+        return
+    document_count = Recipe.objects.count()
+    frequencies = feature_frequencies(targets)
+    ingredients, favorites, _ = recipe_features(targets)
+    informative = {
+        kind: {
+            feature_id for _, feature_id in pairs
+            if not is_common(
+                frequencies.get(feature_id * 2 + kind, 1), document_count
+            )
+        }
+        for kind, pairs in ((INGREDIENT, ingredients), (FAVORITE, favorites))
+    }
+    candidates = Recipe.objects.filter(
+        Q(pk__in=targets)
+        | Q(pk__in=IngredientInRecipe.objects.filter(
+            ingredient_id__in=informative[INGREDIENT]
+        ).values('recipe_id'))
+        | Q(pk__in=Favorite.objects.filter(
+            user_id__in=informative[FAVORITE]
+        ).values('recipe_id'))
+    ).values('pk')
+    vectors = RecipeVectors(
+        [row['pk'] for row in candidates], *recipe_features(candidates),
+        document_count=document_count,
+        frequencies=feature_frequencies(candidates)
+    )
+    target_rows = vectors.rows(sorted(targets))
+    neighbors = dict(vectors.neighbors(target_rows, count))
+    others = np.setdiff1d(np.arange(len(vectors.recipe_ids)), target_rows)
+    changed_rows = vectors.rows(sorted(changed))
+    rows, columns, scores = vectors.pair_scores(others, changed_rows)
+    offers = {}
+    for row, column, score in zip(rows, columns, scores):
+        offers.setdefault(int(vectors.recipe_ids[others[row]]), []).append(
+            (int(vectors.recipe_ids[changed_rows[column]]), float(score))
+        )
+    current = {}
+    for batch in batches(offers):
+        for recipe_id, similar_id, score in SimilarRecipe.objects.filter(
+            recipe_id__in=batch
+        ).values_list('recipe_id', 'similar_id', 'score').order_by():
+            current.setdefault(recipe_id, []).append((similar_id, score))
+    for recipe_id, offered in offers.items():
+        similar = current.get(recipe_id, [])
+        merged = sorted(
+            similar + offered, key=lambda item: (-item[1], -item[0])
+        )[:count]
+        if merged != sorted(similar, key=lambda item: (-item[1], -item[0])):
+            neighbors[recipe_id] = merged
+    save_neighbors(neighbors)
+    bump_version(SIMILAR)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='similar-recipes'
+        )
+    return _executor
+
+
+def shutdown_executor():
+    # Дожидается поставленных задач; следующая задача создаст пул заново.
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def process_pending():
+    # Даем изменениям накопиться: серия добавлений в избранное или правок
+    # рецепта пересчитывается одним проходом.
+    time.sleep(settings.SIMILAR_REFRESH_DELAY)
+    with _pending_lock:
+        recipe_ids = set(_pending)
+        _pending.clear()
+    try:
+        safe_refresh(recipe_ids)
+    finally:
+        connections.close_all()
+
+
+def safe_refresh(recipe_ids):
+    # Изменения уже зафиксированы, и ошибка пересчета не должна
+    # превращать успешный ответ в 500.
+    try:
+        refresh_similar_recipes(recipe_ids)
+    except Exception:
+        logger.exception('Не удалось обновить похожие рецепты')
+
+
+def schedule_similar_refresh(recipe_ids):
+    if not recipe_ids:
+        return
+    if connection.vendor == 'sqlite':
+        # SQLite не дает писать из двух потоков сразу: фоновая запись
+        # роняла бы запросы пользователей с «database is locked».
+        safe_refresh(set(recipe_ids))
+        return
+    with _pending_lock:
+        idle = not _pending
+        _pending.update(recipe_ids)
+    if idle:
+        get_executor().submit(process_pending)
@@ -0,0 +1,92 @@
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase
+from rest_framework.authtoken.models import Token
+
+from api.async_views import IngredientReadView, RecipeReadView, TagReadView
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            Tag)
+from users.models import User
+
+
+class AsyncReadViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+        cls.token = Token.objects.create(user=reader).key
+        lunch = Tag.objects.create(name='Обед', slug='lunch')
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png'
+            )
+            for number in range(3)
+        ]
+        for recipe in cls.recipes:
+            recipe.tags.set([lunch])
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=salt, amount=5
+            )
+        Favorite.objects.create(user=reader, recipe=cls.recipes[0])
+        cls.paths = {
+            RecipeReadView: [
+                ('/api/recipes/', {}),
+                ('/api/recipes/?limit=2&page=2', {}),
+                ('/api/recipes/?tags=lunch&limit=1', {}),
+                (f'/api/recipes/{cls.recipes[0].pk}/', {
+                    'pk': cls.recipes[0].pk
+                }),
+            ],
+            TagReadView: [
+                ('/api/tags/', {}),
+                (f'/api/tags/{lunch.pk}/', {'pk': lunch.pk}),
+            ],
+            IngredientReadView: [
+                ('/api/ingredients/?name=со', {}),
+                (f'/api/ingredients/{salt.pk}/', {'pk': salt.pk}),
+            ],
+        }
+
+    async def assert_same_responses(self, headers):
+        factory = AsyncRequestFactory()
+        for view, paths in self.paths.items():
+            for path, kwargs in paths:
+                with self.subTest(path=path):
+                    await sync_to_async(cache.clear)()
+                    expected = await sync_to_async(self.client.get)(
+                        path, headers=headers
+                    )
+                    await sync_to_async(cache.clear)()
+                    # Переход на синхронную вьюху сделал бы сравнение
+                    # бессмысленным.
+                    with mock.patch.object(
+                        view, 'list_view', staticmethod(self.fail)
+                    ), mock.patch.object(
+                        view, 'detail_view', staticmethod(self.fail)
+                    ):
+                        response = await view.as_view()(
+                            factory.get(path, headers=headers), **kwargs
+                        )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(
+                        json.loads(response.content), expected.json()
+                    )
+
+    async def test_anonymous_responses_match_sync_views(self):
+        await self.assert_same_responses({})
+
+    async def test_user_responses_match_sync_views(self):
+        await self.assert_same_responses(
+            {'Authorization': f'Token {self.token}'}
+        )
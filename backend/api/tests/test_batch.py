@@ -0,0 +1,135 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem)
+from users.models import Subscription, User
+
+
+# Варианты картинки готовит фоновый поток, здесь они не нужны.
+@mock.patch('api.signals.schedule_variants', mock.Mock())
+class BatchEndpointsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for username in ('author', 'reader')
+        )
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        cls.recipes = []
+        for amount in (1, 10, 100, 1000):
+            recipe = Recipe.objects.create(
+                author=cls.author, name='Суп', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png'
+            )
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=salt, amount=amount
+            )
+            cls.recipes.append(recipe.id)
+        cls.unknown = max(cls.recipes) + 1
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def send(self, method, path, ids):
+        response = getattr(self.client, method)(
+            path, {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (row['id'], row['status']) for row in response.json()['results']
+        ]
+
+    def counts(self, field):
+        return dict(Recipe.objects.filter(
+            pk__in=self.recipes
+        ).values_list('id', field))
+
+    def test_add_reports_existing_and_unknown_ids(self):
+        first, second, third, _ = self.recipes
+        ShoppingCart.objects.create(user=self.reader, recipe_id=first)
+        results = self.send(
+            'post', '/api/recipes/shopping_cart/',
+            [first, second, self.unknown, third]
+        )
+        self.assertEqual(results, [
+            (first, 'exists'), (second, 'created'),
+            (self.unknown, 'not_found'), (third, 'created'),
+        ])
+        self.assertEqual(self.counts('in_carts_count'), {
+            first: 1, second: 1, third: 1, self.recipes[3]: 0,
+        })
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=self.reader).total_amount, 111
+        )
+
+    def test_remove_reports_absent_and_unknown_ids(self):
+        first, second, third, _ = self.recipes
+        for recipe_id in (first, second):
+            ShoppingCart.objects.create(user=self.reader, recipe_id=recipe_id)
+        results = self.send(
+            'delete', '/api/recipes/shopping_cart/',
+            [second, third, self.unknown]
+        )
+        self.assertEqual(results, [
+            (second, 'deleted'), (third, 'absent'),
+            (self.unknown, 'not_found'),
+        ])
+        self.assertEqual(self.counts('in_carts_count')[second], 0)
+        self.assertEqual(self.counts('in_carts_count')[first], 1)
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=self.reader).total_amount, 1
+        )
+
+    def test_repeated_batch_changes_nothing(self):
+        self.send('post', '/api/recipes/favorite/', self.recipes)
+        results = self.send('post', '/api/recipes/favorite/', self.recipes)
+        self.assertEqual(
+            {status for _, status in results}, {'exists'}
+        )
+        self.assertEqual(set(self.counts('favorites_count').values()), {1})
+        self.send('delete', '/api/recipes/favorite/', self.recipes)
+        results = self.send('delete', '/api/recipes/favorite/', self.recipes)
+        self.assertEqual({status for _, status in results}, {'absent'})
+        self.assertEqual(set(self.counts('favorites_count').values()), {0})
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_side_effects_applied_once_per_batch(self):
+        costs = []
+        for ids in (self.recipes[:1], self.recipes[1:]):
+            for method in ('post', 'delete'):
+                with CaptureQueriesContext(connection) as context:
+                    self.send(method, '/api/recipes/shopping_cart/', ids)
+                costs.append(len(context.captured_queries))
+        self.assertEqual(costs[:2], costs[2:])
+
+    def test_subscribe_batch(self):
+        Subscription.objects.create(user=self.reader, author=self.author)
+        other = User.objects.create_user(
+            username='other', email='other@example.com',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        unknown = other.id + 1
+        results = self.send(
+            'post', '/api/users/subscribe/',
+            [self.author.id, other.id, self.reader.id, unknown]
+        )
+        self.assertEqual(results, [
+            (self.author.id, 'exists'), (other.id, 'created'),
+            (self.reader.id, 'self'), (unknown, 'not_found'),
+        ])
+        self.assertEqual(
+            dict(User.objects.values_list('id', 'subscribers_count')),
+            {self.author.id: 1, other.id: 1, self.reader.id: 0}
+        )
+        self.send('delete', '/api/users/subscribe/', [self.author.id])
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.subscribers_count, 0)
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem)
+from users.models import Subscription, User
+
+
+# Варианты картинки готовит фоновый поток, здесь они не нужны.
+@mock.patch('api.signals.schedule_variants', mock.Mock())
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for username in ('author', 'reader')
+        )
+        cls.salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def create_recipe(self, author=None):
+        recipe = Recipe.objects.create(
+            author=author or self.author, name='Суп', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png'
+        )
+        IngredientInRecipe.objects.create(
+            recipe=recipe, ingredient=self.salt, amount=5
+        )
+        return recipe
+
+    def counters(self, instance, *fields):
+        instance.refresh_from_db(fields=fields)
+        return tuple(getattr(instance, field) for field in fields)
+
+    def test_recipes_count_follows_orm_changes(self):
+        recipe = self.create_recipe()
+        self.assertEqual(self.counters(self.author, 'recipes_count'), (1,))
+        recipe.author = self.reader
+        recipe.save()
+        self.assertEqual(self.counters(self.author, 'recipes_count'), (0,))
+        self.assertEqual(self.counters(self.reader, 'recipes_count'), (1,))
+        recipe.delete()
+        self.assertEqual(self.counters(self.reader, 'recipes_count'), (0,))
+
+    def test_recipe_counters_follow_orm_changes(self):
+        recipe = self.create_recipe()
+        updated_at = recipe.updated_at
+        Favorite.objects.create(user=self.reader, recipe=recipe)
+        cart = ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        self.assertEqual(
+            self.counters(recipe, 'favorites_count', 'in_carts_count'),
+            (1, 1)
+        )
+        self.assertGreater(self.counters(recipe, 'updated_at')[0], updated_at)
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=self.reader).total_amount, 5
+        )
+        cart.delete()
+        Favorite.objects.filter(user=self.reader).delete()
+        self.assertEqual(
+            self.counters(recipe, 'favorites_count', 'in_carts_count'),
+            (0, 0)
+        )
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_moved_relation_moves_counters(self):
+        first, second = self.create_recipe(), self.create_recipe()
+        favorite = Favorite.objects.create(user=self.reader, recipe=first)
+        favorite = Favorite.objects.get(pk=favorite.pk)
+        favorite.recipe = second
+        favorite.save()
+        self.assertEqual(self.counters(first, 'favorites_count'), (0,))
+        self.assertEqual(self.counters(second, 'favorites_count'), (1,))
+        favorite.save()
+        self.assertEqual(self.counters(second, 'favorites_count'), (1,))
+
+    def test_subscribers_count_follows_orm_changes(self):
+        subscription = Subscription.objects.create(
+            user=self.reader, author=self.author
+        )
+        self.assertEqual(self.counters(self.author, 'subscribers_count'), (1,))
+        subscription.delete()
+        self.assertEqual(self.counters(self.author, 'subscribers_count'), (0,))
+
+    def test_deleted_user_releases_counters(self):
+        recipe = self.create_recipe()
+        Favorite.objects.create(user=self.reader, recipe=recipe)
+        ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        Subscription.objects.create(user=self.reader, author=self.author)
+        self.reader.delete()
+        self.assertEqual(
+            self.counters(recipe, 'favorites_count', 'in_carts_count'),
+            (0, 0)
+        )
+        self.assertEqual(self.counters(self.author, 'subscribers_count'), (0,))
+
+    def test_api_counts_each_change_once(self):
+        recipe = self.create_recipe()
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        response = client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(response.json()['subscribers_count'], 1)
+        client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        client.post('/api/recipes/shopping_cart/', {'ids': [recipe.pk]})
+        self.assertEqual(
+            self.counters(recipe, 'favorites_count', 'in_carts_count'),
+            (1, 1)
+        )
+        self.assertEqual(self.counters(self.author, 'subscribers_count'), (1,))
+        client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        client.delete(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(self.counters(recipe, 'favorites_count'), (0,))
+        self.assertEqual(self.counters(self.author, 'subscribers_count'), (0,))
@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class TagFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.lunch, cls.dinner, cls.dessert = Tag.objects.bulk_create(
+            Tag(name=name, slug=slug) for name, slug in (
+                ('Обед', 'lunch'), ('Ужин', 'dinner'), ('Десерт', 'dessert')
+            )
+        )
+        cls.both, cls.lunch_only, cls.untagged = (
+            Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=10,
+                image='recipes/images/recipe.png'
+            )
+            for name in ('Суп', 'Салат', 'Чай')
+        )
+        cls.both.tags.set([cls.lunch, cls.dinner])
+        cls.lunch_only.tags.set([cls.lunch])
+
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, query):
+        response = self.client.get(f'/api/recipes/?{query}&limit=10')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_any_of_tags_without_duplicates(self):
+        self.assertEqual(
+            sorted(self.ids('tags=lunch&tags=dinner')),
+            sorted([self.both.id, self.lunch_only.id])
+        )
+        self.assertEqual(self.ids('tags=dinner'), [self.both.id])
+        self.assertEqual(self.ids('tags=dessert'), [])
+
+    def test_unknown_slug_rejected(self):
+        response = self.client.get('/api/recipes/?tags=breakfast')
+        self.assertEqual(response.status_code, 400)
+
+    def test_new_tag_available_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            breakfast = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.untagged.tags.set([breakfast])
+        self.assertEqual(self.ids('tags=breakfast'), [self.untagged.id])
+
+    def test_slug_missing_from_refreshed_map_matches_nothing(self):
+        # Тег удалили между проверкой choices и фильтрацией.
+        queryset = RecipeFilter().filter_tags(
+            Recipe.objects.all(), 'tags', ['lunch', 'removed']
+        )
+        self.assertEqual(
+            sorted(queryset.values_list('id', flat=True)),
+            sorted([self.both.id, self.lunch_only.id])
+        )
@@ -0,0 +1,94 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.images import (VARIANT_SIZES, build_variants, delete_variants,
+                        process_variants)
+from foodgram_backend.storage import get_content_storage
+from recipes.models import Recipe
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageVariantsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+
+    def setUp(self):
+        self.name = get_content_storage().save(
+            'recipes/images/recipe.png', png(1600, 1000)
+        )
+
+    def test_variants_fit_their_sizes(self):
+        variants = build_variants(self.name)
+        self.assertEqual(variants['source'], self.name)
+        self.assertTrue(
+            variants['placeholder'].startswith('data:image/jpeg;base64,')
+        )
+        for variant, size in VARIANT_SIZES.items():
+            self.assertEqual(set(variants[variant]), {'webp', 'jpeg'})
+            for name in variants[variant].values():
+                with default_storage.open(name) as file:
+                    self.assertEqual(Image.open(file).width, size)
+        delete_variants(self.name)
+        self.assertFalse(any(
+            default_storage.exists(name)
+            for variant in VARIANT_SIZES
+            for name in variants[variant].values()
+        ))
+
+    def test_saved_recipe_schedules_variants_after_commit(self):
+        with mock.patch('api.signals.schedule_variants') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe = Recipe.objects.create(
+                    author=self.author, name='Суп', text='Описание',
+                    cooking_time=10, image=self.name
+                )
+        schedule.assert_called_once_with(
+            Recipe, recipe.pk, 'image', 'image_variants', self.name
+        )
+
+    # Фоновый поток закрывает свои соединения, а в тесте он работает
+    # в соединении самого теста.
+    @mock.patch('api.images.connections')
+    def test_variants_skip_replaced_image(self, connections):
+        replaced = get_content_storage().save(
+            'recipes/images/recipe.png', png(200, 100)
+        )
+        recipe = Recipe.objects.create(
+            author=self.author, name='Суп', text='Описание',
+            cooking_time=10, image=self.name
+        )
+        self.assertTrue(process_variants(
+            Recipe, recipe.pk, 'image', 'image_variants', replaced
+        ))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
+        self.assertTrue(process_variants(
+            Recipe, recipe.pk, 'image', 'image_variants', self.name
+        ))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants['source'], self.name)
@@ -0,0 +1,147 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.indexes import ingredient_index, recipe_ingredient_index
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import User
+
+
+class IngredientIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in (
+                'сахар', 'сахарная пудра', 'ванильный сахар', 'соль',
+                'тростниковый сахар', 'сало',
+            )
+        )
+
+    def setUp(self):
+        # Новая версия в кеше заставляет индекс перечитать таблицу.
+        cache.clear()
+
+    def names(self, query='', limit=None):
+        return [row['name'] for row in ingredient_index.search(query, limit)]
+
+    def test_prefix_matches_first_then_substrings(self):
+        self.assertEqual(self.names('САХ'), [
+            'сахар', 'сахарная пудра', 'ванильный сахар',
+            'тростниковый сахар',
+        ])
+
+    def test_limit_applies_to_prefix_matches(self):
+        self.assertEqual(self.names('са', 2), ['сало', 'сахар'])
+
+    def test_empty_query_returns_all_in_name_order(self):
+        self.assertEqual(self.names(), [
+            'ванильный сахар', 'сало', 'сахар', 'сахарная пудра', 'соль',
+            'тростниковый сахар',
+        ])
+
+    def test_new_ingredient_found_after_commit(self):
+        self.assertEqual(self.names('сол'), ['соль'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='солод', measurement_unit='г')
+        self.assertEqual(self.names('сол'), ['солод', 'соль'])
+
+    def test_api_matches_index(self):
+        response = self.client.get('/api/ingredients/?name=сах&limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['name'] for row in response.json()],
+            self.names('сах', 3)
+        )
+
+
+class RecipeIngredientIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.flour, cls.eggs, cls.milk, cls.sugar = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'яйца', 'молоко', 'сахар')
+        )
+        cls.recipes = {}
+        for name, ingredients in (
+            ('омлет', (cls.eggs, cls.milk)),
+            ('блины', (cls.flour, cls.eggs, cls.milk)),
+            ('яичница', (cls.eggs,)),
+            ('сироп', (cls.sugar, cls.flour)),
+        ):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=10,
+                image='recipes/images/recipe.png'
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+                for ingredient in ingredients
+            )
+            cls.recipes[name] = recipe.id
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, mode, max_missing=0, limit=None):
+        count, results = recipe_ingredient_index.search(
+            [self.eggs.id, self.milk.id], mode, max_missing, limit
+        )
+        names = {recipe_id: name for name, recipe_id in self.recipes.items()}
+        return count, [
+            (names[row['id']], row['matched'], row['missing'])
+            for row in results
+        ]
+
+    def test_all_mode_orders_by_missing_ingredients(self):
+        self.assertEqual(self.search('all'), (2, [
+            ('омлет', 2, 0), ('блины', 2, 1),
+        ]))
+
+    def test_any_mode_orders_by_matched_ingredients(self):
+        self.assertEqual(self.search('any'), (3, [
+            ('омлет', 2, 0), ('блины', 2, 1), ('яичница', 1, 0),
+        ]))
+        self.assertEqual(self.search('any', limit=2)[0], 3)
+        self.assertEqual(len(self.search('any', limit=2)[1]), 2)
+
+    def test_missing_mode_limits_extra_ingredients(self):
+        self.assertEqual(self.search('missing'), (2, [
+            ('омлет', 2, 0), ('яичница', 1, 0),
+        ]))
+        self.assertEqual(self.search('missing', max_missing=1), (3, [
+            ('омлет', 2, 0), ('яичница', 1, 0), ('блины', 2, 1),
+        ]))
+
+    def test_changed_recipe_found_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientInRecipe.objects.create(
+                recipe_id=self.recipes['сироп'], ingredient=self.eggs,
+                amount=1
+            )
+        self.assertEqual(self.search('any')[0], 4)
+
+    def test_api_uses_index(self):
+        response = self.client.get(
+            f'/api/recipes/by-ingredients/?ingredients={self.eggs.id}'
+            f'&ingredients={self.milk.id}&mode=any&limit=2'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'count': 3,
+            'results': [
+                {'id': self.recipes['омлет'], 'matched': 2, 'missing': 0},
+                {'id': self.recipes['блины'], 'matched': 2, 'missing': 1},
+            ],
+        })
+
+    def test_api_rejects_unknown_mode(self):
+        response = self.client.get(
+            f'/api/recipes/by-ingredients/?ingredients={self.eggs.id}'
+            '&mode=some'
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.metrics import LATENCY_BUCKETS, UNMATCHED, Metrics, RequestStats
+from api.metrics import metrics as global_metrics
+from recipes.models import Tag
+
+
+class MetricsRenderTest(SimpleTestCase):
+    def test_histogram_is_cumulative(self):
+        metrics = Metrics()
+        stats = RequestStats()
+        stats.queries, stats.sql_time = 3, 0.002
+        metrics.record('tags-list', 'GET', 0.004, stats)
+        metrics.record('tags-list', 'GET', 0.3, stats)
+        lines = metrics.render().splitlines()
+        labels = '{view="tags-list",method="GET"}'
+        self.assertIn(f'http_requests_total{labels} 2', lines)
+        self.assertIn(
+            'http_request_duration_seconds_bucket'
+            '{view="tags-list",method="GET",le="0.005"} 1', lines
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket'
+            '{view="tags-list",method="GET",le="0.5"} 2', lines
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket'
+            '{view="tags-list",method="GET",le="+Inf"} 2', lines
+        )
+        self.assertEqual(
+            sum(line.startswith('http_request_duration_seconds_bucket')
+                for line in lines),
+            len(LATENCY_BUCKETS) + 1
+        )
+        self.assertIn(f'db_queries_total{labels} 6', lines)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', lines)
+
+    def test_label_values_escaped(self):
+        metrics = Metrics()
+        metrics.record('a"b\\c', 'GET', 0.1, RequestStats())
+        self.assertIn(
+            'http_requests_total{view="a\\"b\\\\c",method="GET"} 1',
+            metrics.render().splitlines()
+        )
+
+
+class MetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Обед', slug='lunch')
+
+    def setUp(self):
+        cache.clear()
+
+    def entry(self, view, method='GET'):
+        return global_metrics.snapshot().get((view, method), (0, 0.0, 0, 0.0))
+
+    def test_requests_and_queries_recorded_per_view(self):
+        before = self.entry('tags-list')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/tags/')
+        after = self.entry('tags-list')
+        self.assertEqual(after[0] - before[0], 1)
+        self.assertTrue(context.captured_queries)
+        self.assertEqual(after[2] - before[2], len(context.captured_queries))
+        self.assertGreater(after[1], before[1])
+
+    def test_unknown_path_recorded_as_unmatched(self):
+        before = self.entry(UNMATCHED)
+        self.client.get('/missing/')
+        self.assertEqual(self.entry(UNMATCHED)[0] - before[0], 1)
+
+    def test_endpoint_serves_text_format(self):
+        self.client.get('/api/tags/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            'http_requests_total{view="tags-list",method="GET"}',
+            response.content.decode()
+        )
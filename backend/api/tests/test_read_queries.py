@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+class RecipeReadQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name=name, last_name=name, password='password'
+            )
+            for name in ('author', 'reader')
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=name, slug=slug)
+            for name, slug in (('Обед', 'lunch'), ('Ужин', 'dinner'))
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        )
+        cls.recipes = []
+        for number in range(8):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png'
+            )
+            recipe.tags.set(tags[:number % 2 + 1])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=10
+                )
+                for ingredient in ingredients[:number + 1]
+            )
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[1])
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+
+    def count_queries(self, url, user=None):
+        cache.clear()
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_cost_does_not_depend_on_page_size(self):
+        for user in (None, self.reader):
+            with self.subTest(user=user):
+                self.assertEqual(
+                    self.count_queries('/api/recipes/?limit=1', user),
+                    self.count_queries('/api/recipes/?limit=8', user)
+                )
+
+    def test_detail_cost_does_not_depend_on_ingredients(self):
+        small, large = self.recipes[0], self.recipes[-1]
+        for user in (None, self.reader):
+            with self.subTest(user=user):
+                self.assertEqual(
+                    self.count_queries(f'/api/recipes/{small.pk}/', user),
+                    self.count_queries(f'/api/recipes/{large.pk}/', user)
+                )
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.shortlinks import hit_counter
+from recipes.models import Recipe, ShortLink
+from users.models import User
+
+
+class ShortLinkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Борщ', text='Описание', cooking_time=10,
+            image='recipes/images/recipe.png'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_link(self, pk):
+        return self.client.get(f'/api/recipes/{pk}/get-link/')
+
+    def test_link_is_stable(self):
+        first = self.get_link(self.recipe.pk)
+        self.assertEqual(first.status_code, 200)
+        cache.clear()
+        second = self.get_link(self.recipe.pk)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(ShortLink.objects.count(), 1)
+
+    def test_link_redirects_to_recipe(self):
+        link = self.get_link(self.recipe.pk).json()['short-link']
+        response = self.client.get(link)
+        self.assertRedirects(
+            response, f'/recipes/{self.recipe.pk}/',
+            fetch_redirect_response=False
+        )
+
+    def test_unknown_recipe_and_code(self):
+        self.assertEqual(self.get_link(self.recipe.pk + 1).status_code, 404)
+        self.assertEqual(self.client.get('/s/unknown/').status_code, 404)
+
+    def test_deleted_recipe_link_stops_resolving(self):
+        link = self.get_link(self.recipe.pk).json()['short-link']
+        self.client.get(link)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertEqual(self.client.get(link).status_code, 404)
+
+    @override_settings(
+        SHORT_LINK_HITS_FLUSH_SIZE=2, SHORT_LINK_HITS_FLUSH_INTERVAL=60
+    )
+    def test_hits_flushed_in_batches(self):
+        hit_counter.flush()
+        link = self.get_link(self.recipe.pk).json()['short-link']
+        self.client.get(link)
+        self.assertEqual(ShortLink.objects.get().hits, 0)
+        self.client.get(link)
+        self.assertEqual(ShortLink.objects.get().hits, 2)
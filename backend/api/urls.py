@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -11,3 +12,26 @@ router.register('ingredients', IngredientViewSet, basename='ingredients')
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    from .async_views import IngredientReadView, RecipeReadView, TagReadView
+
+    # Имена те же, что у маршрутов роутера, чтобы reverse() давал одинаковые
+    # адреса в обоих режимах.
+    urlpatterns = [
+        path('recipes/', RecipeReadView.as_view(), name='recipes-list'),
+        path(
+            'recipes/<int:pk>/', RecipeReadView.as_view(),
+            name='recipes-detail'
+        ),
+        path('tags/', TagReadView.as_view(), name='tags-list'),
+        path('tags/<int:pk>/', TagReadView.as_view(), name='tags-detail'),
+        path(
+            'ingredients/', IngredientReadView.as_view(),
+            name='ingredients-list'
+        ),
+        path(
+            'ingredients/<int:pk>/', IngredientReadView.as_view(),
+            name='ingredients-detail'
+        ),
+    ] + urlpatterns
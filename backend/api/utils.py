@@ -1,10 +1,145 @@
-def generate_shopping_cart_content(ingredients):
-    lines = []
+import asyncio
+import csv
+import io
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+ASYNC_BATCH_SIZE = 500
+PDF_CHUNK_SIZE = 64 * 1024
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+
+_pdf_executor = None
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def shopping_cart_lines(ingredients):
     for item in ingredients:
-        line = (
+        yield (
             f"{item['ingredient__name']} "
             f"({item['ingredient__measurement_unit']}) — "
             f"{item['total_amount']}"
         )
-        lines.append(line)
-    return '\n'.join(lines)
+
+
+def generate_shopping_cart_content(ingredients):
+    separator = ''
+    for line in shopping_cart_lines(ingredients):
+        yield separator + line
+        separator = '\n'
+
+
+def generate_shopping_cart_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for item in ingredients:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['total_amount'],
+        ))
+
+
+def render_shopping_cart_pdf(lines, font_path):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - PDF_MARGIN
+    for line in lines:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            y = height - PDF_MARGIN
+        pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+        pdf.drawString(PDF_MARGIN, y, line)
+        y -= PDF_FONT_SIZE * 1.5
+    pdf.save()
+    return buffer.getvalue()
+
+
+def get_pdf_executor():
+    global _pdf_executor
+    if _pdf_executor is None:
+        _pdf_executor = ProcessPoolExecutor(
+            max_workers=settings.SHOPPING_CART_PDF_WORKERS
+        )
+    return _pdf_executor
+
+
+def submit_shopping_cart_pdf(lines):
+    return get_pdf_executor().submit(
+        render_shopping_cart_pdf, lines, settings.SHOPPING_CART_PDF_FONT
+    )
+
+
+def pdf_chunks(content):
+    for start in range(0, len(content), PDF_CHUNK_SIZE):
+        yield content[start:start + PDF_CHUNK_SIZE]
+
+
+def generate_shopping_cart_pdf(ingredients):
+    # PDF собирается целиком в отдельном процессе, отдаем его частями.
+    yield from pdf_chunks(submit_shopping_cart_pdf(
+        list(shopping_cart_lines(ingredients))
+    ).result())
+
+
+async def iterate_in_thread(iterator, batch_size=ASYNC_BATCH_SIZE):
+    # Синхронный итератор под ASGI Django 4.2 сначала читает целиком, а
+    # асинхронный отдает по мере готовности. Строки из курсора забираем
+    # пачками в потоке запроса, там же, где открыто соединение с базой.
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch_size)))
+    batch = await next_batch()
+    while batch:
+        for chunk in batch:
+            yield chunk
+        batch = await next_batch()
+
+
+def in_thread(generate_content):
+    def generate(ingredients):
+        return iterate_in_thread(generate_content(ingredients))
+    return generate
+
+
+async def agenerate_shopping_cart_pdf(ingredients):
+    lines = await sync_to_async(
+        lambda: list(shopping_cart_lines(ingredients))
+    )()
+    # Ждем процесс, не занимая ни цикл событий, ни поток запроса.
+    content = await asyncio.wrap_future(submit_shopping_cart_pdf(lines))
+    for chunk in pdf_chunks(content):
+        yield chunk
+
+
+# Формат: генератор для WSGI, асинхронный генератор для ASGI и тип ответа.
+SHOPPING_CART_FORMATS = {
+    'txt': (
+        generate_shopping_cart_content,
+        in_thread(generate_shopping_cart_content),
+        'text/plain',
+    ),
+    'csv': (
+        generate_shopping_cart_csv,
+        in_thread(generate_shopping_cart_csv),
+        'text/csv',
+    ),
+    'pdf': (
+        generate_shopping_cart_pdf,
+        agenerate_shopping_cart_pdf,
+        'application/pdf',
+    ),
+}
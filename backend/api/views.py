@@ -1,45 +1,87 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
 from recipes.permissions import IsAuthorOrReadOnly
-from recipes.serializers import (IngredientSerializer, RecipeReadSerializer,
+from recipes.serializers import (BatchSerializer, IngredientSearchSerializer,
+                                 IngredientSerializer, RecipeReadSerializer,
                                  RecipeWriteSerializer,
                                  ShortRecipeSerializer, TagSerializer)
+from users.serializers import Base64ImageField
+from api.batch import NOT_FOUND, add_pairs, batch_results, remove_pairs
+from api.cache import (INGREDIENTS, RECIPES, SIMILAR, TAGS, CachedReadMixin,
+                       get_or_compute)
+from api.conditional import (ConditionalReadMixin, recipe_list_validators,
+                             recipe_validators)
 from api.filters import RecipeFilter
-from api.utils import generate_shopping_cart_content
+from api.indexes import ingredient_index, recipe_ingredient_index
+from api.metrics import metrics
+from api.shortlinks import hit_counter, short_links
+from api.similarity import SIMILAR_KEY
+from api.utils import SHOPPING_CART_FORMATS
+from foodgram_backend.cache import get_version
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class IgnoreFormatContentNegotiation(DefaultContentNegotiation):
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class TagViewSet(ConditionalReadMixin, CachedReadMixin,
+                 viewsets.ReadOnlyModelViewSet):
+    cache_namespace = TAGS
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalReadMixin, CachedReadMixin,
+                        viewsets.ReadOnlyModelViewSet):
+    cache_namespace = INGREDIENTS
+    queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
 
-    def get_queryset(self):
-        queryset = Ingredient.objects.all()
-        name = self.request.query_params.get('name')
-        if name:
-            return queryset.filter(name__istartswith=name)
-        return queryset
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(self.search, request)
+
+    def search(self, request):
+        return Response(ingredient_index.search(
+            request.query_params.get('name', ''), self.get_limit()
+        ))
+
+    def get_limit(self):
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return None
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValidationError(
+                {'limit': 'Должно быть положительным целым числом.'}
+            )
+        return int(limit)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalReadMixin, CachedReadMixin,
+                    viewsets.ModelViewSet):
+    cache_namespace = RECIPES
+    per_user_flags = True
     queryset = Recipe.objects.all()
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly,
@@ -48,11 +90,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.with_read_data(self.request.user)
+        return super().get_queryset()
+
+    def get_validators(self, request, pk):
+        if pk is None:
+            return recipe_list_validators(
+                request, request.accepted_renderer.format
+            )
+        return recipe_validators(
+            request, pk, request.accepted_renderer.format
+        )
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def _read_data(self, recipe):
+        recipe = Recipe.objects.with_read_data(self.request.user).get(
+            pk=recipe.pk
+        )
+        return RecipeReadSerializer(
+            recipe, context=self.get_serializer_context()
+        ).data
+
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -82,31 +147,68 @@ class RecipeViewSet(viewsets.ModelViewSet):
             pk=pk
         )
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        return self._handle_batch_action(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        return self._handle_batch_action(ShoppingCart, request)
+
     @action(
         detail=False,
         methods=['get'],
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=IgnoreFormatContentNegotiation
     )
     def download_shopping_cart(self, request):
         user = request.user
-        ingredients = (
-            IngredientInRecipe.objects.filter(
-                recipe__shopping_cart__user=user
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_CART_FORMATS:
+            return Response(
+                {'format': 'Допустимые форматы: txt, csv, pdf.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        generate_content, agenerate_content, content_type = (
+            SHOPPING_CART_FORMATS[file_format]
+        )
+        if isinstance(request._request, ASGIRequest):
+            generate_content = agenerate_content
+        ingredients = (
+            ShoppingListItem.objects.filter(user=user)
             .values(
                 'ingredient__name',
-                'ingredient__measurement_unit'
+                'ingredient__measurement_unit',
+                'total_amount'
             )
-            .annotate(total_amount=Sum('amount'))
             .order_by('ingredient__name')
         )
-        content = generate_shopping_cart_content(ingredients)
-        response = HttpResponse(content, content_type='text/plain')
+        response = StreamingHttpResponse(
+            generate_content(ingredients.iterator()),
+            content_type=content_type
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"'
+            f'attachment; filename="shopping_cart.{file_format}"'
         )
         return response
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+    @transaction.atomic
     def _handle_custom_action(self, model, serializer_class, request, pk):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -132,16 +234,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @transaction.atomic
+    def _handle_batch_action(self, model, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        existing = set(
+            Recipe.objects.filter(pk__in=ids).values_list('id', flat=True)
+        )
+        targets = [pk for pk in ids if pk in existing]
+        if request.method == 'POST':
+            changed = add_pairs(model, 'user', user.id, 'recipe', targets)
+            done, unchanged = 'created', 'exists'
+        else:
+            changed = remove_pairs(model, 'user', user.id, 'recipe', targets)
+            done, unchanged = 'deleted', 'absent'
+        return Response({'results': batch_results(
+            ids, changed, done, unchanged,
+            {pk: NOT_FOUND for pk in ids if pk not in existing}
+        )})
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
-        read_serializer = RecipeReadSerializer(
-            serializer.instance, context={'request': request}
-        )
         return Response(
-            read_serializer.data,
+            self._read_data(serializer.instance),
             status=status.HTTP_201_CREATED,
             headers=headers
         )
@@ -154,10 +274,46 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        read_serializer = RecipeReadSerializer(
-            serializer.instance, context={'request': request}
+        return Response(self._read_data(serializer.instance))
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='by-ingredients',
+        url_name='by-ingredients',
+        permission_classes=[permissions.AllowAny]
+    )
+    def by_ingredients(self, request):
+        serializer = IngredientSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        count, results = recipe_ingredient_index.search(
+            params['ingredients'], params['mode'], params['max_missing'],
+            params['limit']
         )
-        return Response(read_serializer.data)
+        return Response({'count': count, 'results': results})
+
+    @action(
+        detail=True,
+        methods=['get'],
+        permission_classes=[permissions.AllowAny]
+    )
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        return Response(get_or_compute(
+            SIMILAR_KEY.format(
+                get_version(RECIPES), get_version(SIMILAR), recipe.pk
+            ),
+            lambda: ShortRecipeSerializer(
+                [
+                    similar.similar for similar in recipe.similar_recipes
+                    .select_related('similar').defer('similar__search_vector')
+                ],
+                many=True,
+                context={'request': request}
+            ).data,
+            settings.API_CACHE_TIMEOUT,
+        ))
 
     @action(
         detail=True,
@@ -166,17 +322,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_name='get-link'
     )
     def get_link(self, request, pk=None):
-        recipe = self.get_object()
-        link = request.build_absolute_uri(f'/recipes/{recipe.id}/')
+        code = short_links.get_code(int(pk)) if pk.isdigit() else None
+        if code is None:
+            raise Http404
+        link = request.build_absolute_uri(
+            reverse('short-link', kwargs={'code': code})
+        )
         return Response({'short-link': link}, status=status.HTTP_200_OK)
 
 
+def short_link_redirect(request, code):
+    recipe_id = short_links.resolve(code)
+    if recipe_id is None:
+        raise Http404
+    if settings.SHORT_LINK_COUNT_HITS:
+        hit_counter.add(code)
+    return HttpResponseRedirect(f'/recipes/{recipe_id}/')
+
+
+def metrics_view(request):
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
+    )
+
+
 class RecipeImageView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
     def get(self, request, pk):
-        recipe = Recipe.objects.get(pk=pk)
+        recipe = Recipe.objects.defer('search_vector').get(pk=pk)
         serializer = RecipeReadSerializer(recipe, context={'request': request})
         return Response(
             {'image': serializer.data['image']},
@@ -191,7 +366,7 @@ class RecipeImageView(APIView):
                 {'errors': 'No file provided'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        recipe.image = image
+        recipe.image = Base64ImageField().to_internal_value(image)
         recipe.save()
         serializer = RecipeReadSerializer(recipe, context={'request': request})
         return Response(
@@ -0,0 +1,68 @@
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def fetch(url, token, method='GET', body=None):
+    request = urllib.request.Request(url, data=body, method=method)
+    if token:
+        request.add_header('Authorization', f'Token {token}')
+    if body is not None:
+        request.add_header('Content-Type', 'application/json')
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - started
+
+
+def percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def run(url, concurrency, requests, token):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda _: fetch(url, token), range(requests)
+        ))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for _, latency in results)
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(status != 200 for status, _ in results),
+        'rps': round(requests / elapsed, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('urls', nargs='+')
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    parser.add_argument('-n', '--requests', type=int, default=1000)
+    parser.add_argument('--token')
+    args = parser.parse_args()
+    for url in args.urls:
+        print(json.dumps(
+            run(url, args.concurrency, args.requests, args.token),
+            ensure_ascii=False
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,450 @@
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import django
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+django.setup()
+
+from concurrency import fetch, percentile  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (override_settings,  # noqa: E402
+                               setup_databases, setup_test_environment,
+                               teardown_databases)
+from django.utils import timezone  # noqa: E402
+
+from api import images, similarity  # noqa: E402
+from api.management.commands.seed_scale import (  # noqa: E402
+    DISHES, STYLES, TAGS_DATA)
+from recipes.models import (Ingredient, Recipe,  # noqa: E402
+                            ShoppingCart, Tag)
+from users.models import User  # noqa: E402
+
+PREFIX = 'bench'
+SEARCH_WORDS = DISHES[:6] + STYLES[:4]
+PAGE_SIZE = 6
+SCENARIOS = (
+    'recipe_list', 'recipe_detail', 'ingredient_search', 'subscriptions',
+    'download_shopping_cart', 'recipe_create', 'recipe_update',
+)
+
+
+def image_bytes(color='orange'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+IMAGE = 'data:image/png;base64,' + base64.b64encode(
+    image_bytes('green')
+).decode()
+
+
+def skewed_weights(size):
+    return [1 / rank for rank in range(1, size + 1)]
+
+
+def seed(users, recipes, seed_value):
+    if User.objects.filter(username=f'{PREFIX}0').exists():
+        raise SystemExit('Данные уже засеяны: запустите с --no-seed.')
+    call_command(
+        'seed_scale', users=users, recipes=recipes, seed=seed_value,
+        prefix=PREFIX, tokens=True, favorites_per_user=10, carts_per_user=4,
+        subscriptions_per_user=5, stdout=io.StringIO()
+    )
+
+
+def load_context():
+    users = list(
+        User.objects.filter(username__startswith=PREFIX).values_list(
+            'id', 'auth_token__key'
+        )
+    )
+    if not users:
+        raise SystemExit('Нет тестовых данных: запустите без --no-seed.')
+    tokens = dict(users)
+    recipes = list(Recipe.objects.filter(
+        author_id__in=tokens
+    ).order_by('id').values_list('id', 'author_id'))
+    return {
+        'tokens': tokens,
+        'users': list(tokens),
+        'cart_users': list(ShoppingCart.objects.filter(
+            user_id__in=tokens
+        ).values_list('user_id', flat=True).distinct()),
+        'recipes': recipes,
+        'recipe_weights': skewed_weights(len(recipes)),
+        'tags': [slug for _, slug in TAGS_DATA],
+        'tag_ids': list(Tag.objects.filter(
+            slug__in=[slug for _, slug in TAGS_DATA]
+        ).values_list('id', flat=True)),
+        'ingredients': list(Ingredient.objects.values_list('id', 'name')),
+    }
+
+
+def recipe_body(rng, context):
+    return {
+        'name': f'{rng.choice(STYLES).capitalize()} {rng.choice(DISHES)}',
+        'text': ' '.join(rng.choices(DISHES + STYLES, k=20)),
+        'cooking_time': rng.randint(5, 180),
+        'image': IMAGE,
+        'tags': rng.sample(context['tag_ids'], rng.randint(1, 3)),
+        'ingredients': [
+            {'id': ingredient_id, 'amount': rng.randint(1, 500)}
+            for ingredient_id, _ in rng.sample(
+                context['ingredients'], rng.randint(3, 10)
+            )
+        ],
+    }
+
+
+def build_request(scenario, rng, context):
+    user = rng.choice(context['users'])
+    if scenario == 'recipe_list':
+        params = [('page', rng.randint(1, 5)), ('limit', PAGE_SIZE)]
+        variant = rng.choice((
+            'all', 'tags', 'author', 'search', 'is_favorited',
+            'is_in_shopping_cart',
+        ))
+        if variant == 'tags':
+            params += [
+                ('tags', slug) for slug in rng.sample(context['tags'], 2)
+            ]
+        elif variant == 'author':
+            params[0] = ('page', 1)
+            params.append(('author', rng.choice(context['recipes'])[1]))
+        elif variant == 'search':
+            params[0] = ('page', 1)
+            params.append(('search', rng.choice(SEARCH_WORDS)))
+        elif variant != 'all':
+            params[0] = ('page', 1)
+            params.append((variant, 1))
+        if variant in ('all', 'tags') and rng.random() < 0.5:
+            user = None
+        return user, 'GET', '/api/recipes/?' + urlencode(params), None, 200
+    if scenario == 'recipe_detail':
+        recipe_id, _ = rng.choices(
+            context['recipes'], context['recipe_weights']
+        )[0]
+        if rng.random() < 0.5:
+            user = None
+        return user, 'GET', f'/api/recipes/{recipe_id}/', None, 200
+    if scenario == 'ingredient_search':
+        _, name = rng.choice(context['ingredients'])
+        query = urlencode({'name': name[:rng.randint(1, 3)]})
+        return None, 'GET', f'/api/ingredients/?{query}', None, 200
+    if scenario == 'subscriptions':
+        return (
+            user, 'GET',
+            f'/api/users/subscriptions/?limit={PAGE_SIZE}&recipes_limit=3',
+            None, 200
+        )
+    if scenario == 'download_shopping_cart':
+        return (
+            rng.choice(context['cart_users']), 'GET',
+            '/api/recipes/download_shopping_cart/', None, 200
+        )
+    if scenario == 'recipe_create':
+        return (
+            user, 'POST', '/api/recipes/', recipe_body(rng, context), 201
+        )
+    recipe_id, author_id = rng.choice(context['recipes'])
+    body = recipe_body(rng, context)
+    del body['image']
+    return author_id, 'PATCH', f'/api/recipes/{recipe_id}/', body, 200
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def summarize(latencies, statuses, expected, elapsed, queries=None):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': sum(status != expected for status in statuses),
+        'rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_per_request': (
+            None if queries is None else round(queries / len(latencies), 2)
+        ),
+    }
+
+
+def drain_background():
+    # Пересчет похожих рецептов и варианты картинок пишут в базу из своих
+    # потоков: без ожидания они попадают в замеры следующего сценария, а
+    # после удаления временной базы падают с «no such table».
+    similarity.shutdown_executor()
+    images.shutdown_executor()
+
+
+def run_in_process(requests, context, client):
+    latencies, statuses, queries = [], [], 0
+    started = time.perf_counter()
+    for user, method, path, body, _ in requests:
+        headers = {}
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Token {context["tokens"][user]}'
+        counter = QueryCounter()
+        request_started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                response = client.generic(
+                    method, path,
+                    json.dumps(body) if body is not None else '',
+                    content_type='application/json', **headers
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            status = response.status_code
+        except Exception:
+            # Упавший запрос считается ошибкой и не обрывает прогон.
+            status = None
+        latencies.append(time.perf_counter() - request_started)
+        statuses.append(status)
+        queries += counter.queries
+    return summarize(
+        latencies, statuses, requests[0][4], time.perf_counter() - started,
+        queries
+    )
+
+
+def scrape_queries(url):
+    totals = Counter()
+    try:
+        with urllib.request.urlopen(url + '/metrics') as response:
+            lines = response.read().decode().splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        if 'view="metrics"' in line:
+            continue
+        for name in ('http_requests_total', 'db_queries_total'):
+            if line.startswith(name + '{'):
+                totals[name] += float(line.rsplit(' ', 1)[1])
+    return totals
+
+
+def run_over_http(url, requests, context, concurrency):
+    before = scrape_queries(url)
+
+    def send(request):
+        user, method, path, body, _ = request
+        started = time.perf_counter()
+        try:
+            return fetch(
+                url + path, context['tokens'].get(user), method,
+                json.dumps(body).encode() if body is not None else None
+            )
+        except Exception:
+            return None, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, requests))
+    elapsed = time.perf_counter() - started
+    after = scrape_queries(url)
+    queries = None
+    if before is not None and after is not None:
+        handled = after['http_requests_total'] - before['http_requests_total']
+        if handled:
+            queries = (
+                after['db_queries_total'] - before['db_queries_total']
+            ) / handled * len(results)
+    return summarize(
+        [latency for _, latency in results],
+        [status for status, _ in results], requests[0][4], elapsed, queries
+    )
+
+
+def compare(results, baseline, tolerance):
+    rows = []
+    for scenario, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(scenario)
+        if previous is None:
+            continue
+        row = {'scenario': scenario}
+        for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            row[key + '_change_%'] = round(
+                (current[key] - previous[key]) / previous[key] * 100, 1
+            ) if previous[key] else None
+        row['queries_change'] = (
+            None if None in (
+                current['queries_per_request'],
+                previous['queries_per_request']
+            )
+            else round(
+                current['queries_per_request']
+                - previous['queries_per_request'], 2
+            )
+        )
+        row['regression'] = bool(
+            (row['p95_ms_change_%'] or 0) > tolerance
+            or (row['queries_change'] or 0) > 0
+        )
+        rows.append(row)
+    return rows
+
+
+def benchmark(args, results):
+    if not args.no_seed:
+        started = time.perf_counter()
+        seed(args.users, args.recipes, args.seed)
+        print(json.dumps({
+            'seeded_users': args.users,
+            'seeded_recipes': args.recipes,
+            'seed_s': round(time.perf_counter() - started, 2),
+        }))
+    context = load_context()
+    client = Client()
+    results.update({
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'mode': 'http' if args.url else 'in-process',
+            'url': args.url,
+            'concurrency': args.concurrency if args.url else 1,
+            'database': connection.vendor,
+            'users': len(context['users']),
+            'recipes': len(context['recipes']),
+            'requests': args.requests,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'scenarios': {},
+    })
+    for scenario in args.scenarios:
+        # У каждого сценария свой генератор: набор запросов не зависит от
+        # того, какие еще сценарии выбраны.
+        rng = random.Random(f'{args.seed}:{scenario}')
+        requests = [
+            build_request(scenario, rng, context)
+            for _ in range(args.warmup + args.requests)
+        ]
+        warmup, requests = requests[:args.warmup], requests[args.warmup:]
+        if args.url:
+            if warmup:
+                run_over_http(args.url, warmup, context, args.concurrency)
+            result = run_over_http(
+                args.url, requests, context, args.concurrency
+            )
+        else:
+            if warmup:
+                run_in_process(warmup, context, client)
+                drain_background()
+            result = run_in_process(requests, context, client)
+            drain_background()
+        results['scenarios'][scenario] = result
+        print(json.dumps({'scenario': scenario, **result}, ensure_ascii=False))
+
+
+def run_with_test_database(args, results):
+    with tempfile.TemporaryDirectory() as directory:
+        database = settings.DATABASES['default']
+        if database['ENGINE'].endswith('sqlite3'):
+            database.setdefault('TEST', {})['NAME'] = os.path.join(
+                directory, 'benchmark.sqlite3'
+            )
+        with override_settings(
+            MEDIA_ROOT=directory,
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'benchmark',
+            }},
+        ):
+            setup_test_environment()
+            databases = setup_databases(verbosity=0, interactive=False)
+            try:
+                benchmark(args, results)
+            finally:
+                drain_background()
+                teardown_databases(databases, verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный прогон основных эндпоинтов API.'
+    )
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('-n', '--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument(
+        '--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument(
+        '--url',
+        help='Адрес запущенного backend (например, http://localhost:8000). '
+             'Без него запросы идут через тестовый клиент Django '
+             'во временную базу.'
+    )
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument(
+        '--no-seed', action='store_true',
+        help='Не создавать данные, использовать уже засеянные.'
+    )
+    parser.add_argument(
+        '--seed-only', action='store_true',
+        help='Только засеять базу из настроек и выйти.'
+    )
+    parser.add_argument('-o', '--output', help='Куда сохранить результаты.')
+    parser.add_argument('--baseline', help='Результаты для сравнения.')
+    parser.add_argument(
+        '--tolerance', type=float, default=20,
+        help='Допустимый рост p95 относительно baseline, %%.'
+    )
+    args = parser.parse_args()
+    if args.seed_only:
+        seed(args.users, args.recipes, args.seed)
+        return
+    results = {}
+    try:
+        if args.url:
+            args.url = args.url.rstrip('/')
+            benchmark(args, results)
+        else:
+            run_with_test_database(args, results)
+    finally:
+        # Отчет пишется и при сбое: в нем остаются пройденные сценарии.
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            rows = compare(results, json.load(file), args.tolerance)
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        if any(row['regression'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import django
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+django.setup()
+
+from api.similarity import RecipeVectors  # noqa: E402
+
+INGREDIENTS = 2000
+INGREDIENTS_PER_RECIPE = 8
+TAGS = 10
+FAVORITES_PER_USER = 20
+REFRESH_SAMPLES = 200
+
+
+def skewed(generator, size, count):
+    weights = 1 / np.arange(1, size + 1)
+    return generator.choice(size, count, p=weights / weights.sum())
+
+
+def generate(recipes, seed):
+    generator = np.random.default_rng(seed)
+    recipe_ids = np.arange(1, recipes + 1)
+    ingredients = np.unique(np.column_stack([
+        np.repeat(recipe_ids, INGREDIENTS_PER_RECIPE),
+        skewed(generator, INGREDIENTS, recipes * INGREDIENTS_PER_RECIPE),
+    ]), axis=0)
+    users = max(recipes // 5, 1)
+    favorites = np.unique(np.column_stack([
+        skewed(generator, recipes, users * FAVORITES_PER_USER) + 1,
+        np.repeat(np.arange(1, users + 1), FAVORITES_PER_USER),
+    ]), axis=0)
+    tags = np.unique(np.column_stack([
+        np.repeat(recipe_ids, 2),
+        generator.integers(1, TAGS + 1, recipes * 2),
+    ]), axis=0)
+    return recipe_ids, ingredients, favorites, tags
+
+
+def run(recipes, count, seed):
+    recipe_ids, ingredients, favorites, tags = generate(recipes, seed)
+    started = time.perf_counter()
+    vectors = RecipeVectors(recipe_ids, ingredients, favorites, tags)
+    built = time.perf_counter()
+    neighbors = sum(
+        len(similar)
+        for _, similar in vectors.neighbors(np.arange(recipes), count)
+    )
+    finished = time.perf_counter()
+    sample = np.random.default_rng(seed).choice(
+        recipes, min(REFRESH_SAMPLES, recipes), replace=False
+    )
+    timings = []
+    for row in sample:
+        started_row = time.perf_counter()
+        list(vectors.neighbors(np.array([row]), count))
+        timings.append(time.perf_counter() - started_row)
+    timings.sort()
+    return {
+        'recipes': recipes,
+        'neighbors': neighbors,
+        'vectors_s': round(built - started, 2),
+        'batch_s': round(finished - built, 2),
+        'refresh_p50_ms': round(timings[len(timings) // 2] * 1000, 2),
+        'refresh_p99_ms': round(
+            timings[min(len(timings) - 1, len(timings) * 99 // 100)] * 1000,
+            2
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'sizes', nargs='*', type=int, default=[1000, 10000, 100000]
+    )
+    parser.add_argument('-k', '--count', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    for size in args.sizes:
+        print(json.dumps(run(size, args.count, args.seed)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'api:version:{}'
+
+
+def get_version(namespace):
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Начинаем со времени, а не с единицы: после вытеснения счетчика
+        # старые ответы не должны снова стать актуальными.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*namespaces):
+    # Сдвигаем версию только после COMMIT: иначе чтение между сдвигом и
+    # фиксацией посчитает старые строки и закэширует их под новой версией.
+    # Вне транзакции колбэк выполняется сразу.
+    transaction.on_commit(lambda: increment_versions(namespaces))
+
+
+def increment_versions(namespaces):
+    for namespace in namespaces:
+        key = VERSION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
@@ -0,0 +1,81 @@
+import hashlib
+import os
+from functools import partial
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+CONTENT_STORAGE = 'content'
+
+
+def get_content_storage():
+    return storages[CONTENT_STORAGE]
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_stored_files(self):
+        return apps.get_model('recipes', 'StoredFile').objects
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest.hexdigest() + extension)
+
+    def lock(self, name):
+        # Строка StoredFile служит блокировкой имени: под ней и решаем,
+        # писать ли файл, и удаляем его. Иначе сохранение того же
+        # содержимого могло пропустить запись, пока удаление ждет COMMIT.
+        stored_file, _ = self.get_stored_files().select_for_update(
+        ).get_or_create(name=name, defaults={'references': 0})
+        return stored_file
+
+    def save(self, name, content, max_length=None):
+        name = self.content_name(name, content)
+        with transaction.atomic():
+            self.lock(name)
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length=max_length)
+
+    def delete(self, name):
+        if self.get_stored_files().filter(
+            name=name, references__gt=0
+        ).exists():
+            return
+        super().delete(name)
+
+    def retain(self, name):
+        stored_file, created = self.get_stored_files().get_or_create(
+            name=name, defaults={'references': 1}
+        )
+        if not created:
+            self.get_stored_files().filter(pk=stored_file.pk).update(
+                references=F('references') + 1
+            )
+
+    @transaction.atomic
+    def release(self, name):
+        stored_files = self.get_stored_files().filter(name=name)
+        stored_files.filter(references__gt=0).update(
+            references=F('references') - 1
+        )
+        if stored_files.filter(references__gt=0).exists():
+            return False
+        transaction.on_commit(partial(self.delete_unreferenced, name))
+        return True
+
+    @transaction.atomic
+    def delete_unreferenced(self, name):
+        if self.lock(name).references:
+            return
+        self.get_stored_files().filter(name=name).delete()
+        super().delete(name)
@@ -1,8 +1,12 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views import metrics_view, short_link_redirect
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('s/<str:code>/', short_link_redirect, name='short-link'),
     path('api/', include('api.urls')),
     path('api/', include('users.urls')),
     path('api/', include('djoser.urls')),
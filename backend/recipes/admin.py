@@ -1,41 +1,100 @@
 from django.contrib import admin
+from django.db.models import Count
 
+from users.models import User
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                      ShoppingCart, Tag)
 
+AUTHOR_FILTER_SIZE = 20
+
+
+class AuthorFilter(admin.SimpleListFilter):
+    title = 'автор'
+    parameter_name = 'author'
+
+    def lookups(self, request, model_admin):
+        # Список всех пользователей в фильтре не поместится, поэтому
+        # показываем самых активных авторов по сохраненному счетчику.
+        # Любого другого автора можно выбрать по ?author=<id>.
+        return [
+            (user.id, user.username)
+            for user in User.objects.filter(recipes_count__gt=0).order_by(
+                '-recipes_count'
+            ).only('id', 'username')[:AUTHOR_FILTER_SIZE]
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(author_id=self.value())
+        return queryset
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'slug')
+    list_display = ('id', 'name', 'slug', 'recipes_total')
     search_fields = ('name', 'slug')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_total=Count('recipes')
+        )
+
+    @admin.display(description='Рецептов', ordering='recipes_total')
+    def recipes_total(self, obj):
+        return obj.recipes_total
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'measurement_unit')
     search_fields = ('name',)
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Как и поиск в API, ищем по началу названия целиком: стандартный
+        # поиск делит строку на слова и проверяет каждое по всей таблице.
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(name__istartswith=search_term), False
 
 
 class IngredientInRecipeInline(admin.TabularInline):
     model = IngredientInRecipe
+    autocomplete_fields = ('ingredient',)
     extra = 1
     min_num = 1
     validate_min = True
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
+
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author')
-    search_fields = ('name', 'author__username')
-    list_filter = ('author', 'tags')
+    list_display = (
+        'id', 'name', 'author', 'favorites_count', 'in_carts_count'
+    )
+    list_select_related = ('author',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
+    search_fields = ('name', '^author__username')
+    list_filter = (AuthorFilter, 'tags')
+    autocomplete_fields = ('author',)
     inlines = (IngredientInRecipeInline,)
+    show_full_result_count = False
 
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import IngredientInRecipe, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def expected_totals():
+    return (
+        IngredientInRecipe.objects.filter(recipe__shopping_cart__isnull=False)
+        .values('recipe__shopping_cart__user', 'ingredient')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .values_list('recipe__shopping_cart__user', 'ingredient', 'total')
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает и проверяет агрегированные списки покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Только сравнить агрегат с корзинами, не перестраивая его.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            self.rebuild()
+        self.verify()
+
+    @transaction.atomic
+    def rebuild(self):
+        ShoppingListItem.objects.all().delete()
+        batch = []
+        created = 0
+        for user_id, ingredient_id, total in expected_totals().iterator():
+            batch.append(ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id,
+                total_amount=total
+            ))
+            if len(batch) >= BATCH_SIZE:
+                ShoppingListItem.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        ShoppingListItem.objects.bulk_create(batch)
+        created += len(batch)
+        self.stdout.write(f'Перестроено позиций: {created}.')
+
+    def verify(self):
+        expected = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in expected_totals().iterator()
+        }
+        actual = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            ).iterator()
+        }
+        mismatched = {
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        }
+        if mismatched:
+            raise CommandError(
+                f'Расхождений в списках покупок: {len(mismatched)}.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок согласованы, позиций: {len(actual)}.'
+        ))
@@ -0,0 +1,31 @@
+from collections import Counter
+
+from django.db import migrations
+
+
+def seed_stored_files(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    StoredFile = apps.get_model('recipes', 'StoredFile')
+    references = Counter(
+        Recipe.objects.exclude(image='').values_list('image', flat=True)
+    )
+    references.update(
+        User.objects.exclude(avatar='').values_list('avatar', flat=True)
+    )
+    StoredFile.objects.bulk_create(
+        StoredFile(name=name, references=count)
+        for name, count in references.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_storedfile_alter_recipe_image'),
+        ('users', '0004_alter_user_avatar'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_stored_files, migrations.RunPython.noop),
+    ]
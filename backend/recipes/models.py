@@ -1,7 +1,16 @@
-from django.db import models
-from users.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import (Case, Exists, F, OuterRef, Prefetch, Sum, Value,
+                              When)
+from django.utils import timezone
+
+from foodgram_backend.storage import get_content_storage
+from recipes.search import Match
+from users.models import Subscription, User
 
 FIELD_MAX_LENGTH = 200
+SHORT_LINK_MAX_LENGTH = 16
 
 
 class Tag(models.Model):
@@ -45,6 +54,39 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
+class RecipeQuerySet(models.QuerySet):
+    def touch(self):
+        return self.update(updated_at=timezone.now())
+
+    def with_read_data(self, user):
+        authors = User.objects.all()
+        queryset = self
+        if user.is_authenticated:
+            authors = authors.annotate(is_subscribed=Exists(
+                Subscription.objects.filter(user=user, author=OuterRef('pk'))
+            ))
+            queryset = queryset.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+            )
+        # Поисковый вектор нужен только в WHERE и бывает больше самого
+        # рецепта, поэтому при чтении его не выбираем.
+        return queryset.defer('search_vector').prefetch_related(
+            Prefetch('author', queryset=authors),
+            'tags',
+            Prefetch(
+                'ingredient_amounts',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -58,14 +100,40 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/images/',
+        storage=get_content_storage,
         verbose_name='Изображение'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
     text = models.TextField(
         verbose_name='Описание'
     )
     cooking_time = models.PositiveIntegerField(
         verbose_name='Время приготовления (мин)'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         through='IngredientInRecipe',
@@ -78,15 +146,47 @@ class Recipe(models.Model):
         verbose_name='Теги'
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-id']
+        indexes = [
+            GinIndex(
+                fields=['search_vector'], name='recipe_search_vector_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeSearchIndex(models.Model):
+    # Виртуальная таблица FTS5, которую поиск использует на SQLite (ее
+    # создает миграция 0008). Модель нужна только для соединения с рецептами
+    # в ORM; скрытый столбец с именем таблицы — левая часть MATCH и первый
+    # аргумент bm25().
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_index'
+    )
+    name = models.TextField()
+    text = models.TextField()
+    document = models.TextField(db_column='recipes_recipe_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_fts'
+
+
+RecipeSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
         Recipe,
@@ -160,3 +260,155 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} -> {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(
+        verbose_name='Сходство'
+    )
+
+    class Meta:
+        unique_together = ('recipe', 'similar')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ['-score']
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}'
+
+
+class ShortLink(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_link',
+        verbose_name='Рецепт'
+    )
+    code = models.CharField(
+        max_length=SHORT_LINK_MAX_LENGTH,
+        unique=True,
+        verbose_name='Код'
+    )
+    hits = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Переходы'
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self):
+        return self.code
+
+
+class ShoppingListQuerySet(models.QuerySet):
+    @transaction.atomic
+    def apply_deltas(self, user_ids, deltas):
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+        if not user_ids or not deltas:
+            return
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=0
+                )
+                for user_id in user_ids for ingredient_id in deltas
+            ],
+            ignore_conflicts=True
+        )
+        items = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        items.update(total_amount=F('total_amount') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(delta))
+                for ingredient_id, delta in deltas.items()
+            ),
+            default=Value(0)
+        ))
+        items.filter(total_amount__lte=0).delete()
+
+    def add_recipe(self, user_ids, recipe_id, sign=1):
+        self.apply_deltas(user_ids, {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in IngredientInRecipe.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('ingredient_id', 'amount')
+        })
+
+    def add_recipes(self, user_ids, recipe_ids, sign=1):
+        self.apply_deltas(user_ids, {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in IngredientInRecipe.objects.filter(
+                recipe_id__in=recipe_ids
+            ).order_by().values('ingredient_id').annotate(
+                total=Sum('amount')
+            ).values_list('ingredient_id', 'total')
+        })
+
+    def remove_recipe(self, user_ids, recipe_id):
+        self.add_recipe(user_ids, recipe_id, sign=-1)
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.IntegerField(
+        verbose_name='Общее количество'
+    )
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('user', 'ingredient')
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        ordering = ['user', 'ingredient']
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} — {self.total_amount}'
+
+
+class StoredFile(models.Model):
+    name = models.CharField(
+        max_length=FIELD_MAX_LENGTH,
+        unique=True,
+        verbose_name='Имя файла'
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число ссылок'
+    )
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+        ordering = ['name']
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
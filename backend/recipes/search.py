@@ -0,0 +1,82 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Func, Lookup, Value
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+NAME_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+
+
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+def uses_fts5():
+    return connection.vendor == 'sqlite'
+
+
+def search_recipes(queryset, value):
+    if not uses_fts5():
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-id')
+    terms = re.findall(r'\w+', value)
+    if not terms:
+        return queryset.none()
+    match = ' '.join(f'"{term}"*' for term in terms)
+    # Ранг из коррелированного подзапроса заставлял SQLite заново выполнять
+    # MATCH для каждой найденной строки, поэтому FTS-таблица соединяется
+    # с рецептами один раз.
+    return queryset.filter(search_index__document__match=match).annotate(
+        search_rank=-Func(
+            F('search_index__document'),
+            Value(NAME_WEIGHT),
+            Value(TEXT_WEIGHT),
+            function='bm25', output_field=FloatField()
+        )
+    ).order_by('-search_rank', '-id')
+
+
+def index_recipe(recipe):
+    if not uses_fts5():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (recipe.pk,)
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+            'VALUES (%s, %s, %s)',
+            (recipe.pk, recipe.name, recipe.text)
+        )
+
+
+def unindex_recipe(recipe):
+    if not uses_fts5():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (recipe.pk,)
+        )
+
+
+def index_recipes(recipes):
+    if not uses_fts5():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+            'VALUES (%s, %s, %s)',
+            [(recipe.pk, recipe.name, recipe.text) for recipe in recipes]
+        )
@@ -1,10 +1,15 @@
+from django.db import transaction
 from rest_framework import serializers
 
-from users.serializers import Base64ImageField
-from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.serializers import Base64ImageField, ImageVariantsField
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
 
 MIN_COOKING_TIME = 1
 MIN_INGREDIENT_AMOUNT = 1
+INGREDIENT_SEARCH_LIMIT = 100
+MAX_INGREDIENT_SEARCH_LIMIT = 1000
+MAX_BATCH_SIZE = 100
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -33,10 +38,7 @@ class IngredientInRecipeReadSerializer(serializers.ModelSerializer):
 
 
 class IngredientInRecipeWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient'
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -60,25 +62,31 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'author', 'name', 'image', 'text', 'cooking_time',
-            'ingredients', 'tags', 'is_favorited', 'is_in_shopping_cart',
+            'id', 'author', 'name', 'image', 'image_variants', 'text',
+            'cooking_time', 'ingredients', 'tags', 'is_favorited',
+            'is_in_shopping_cart', 'favorites_count', 'in_carts_count',
         )
 
     def get_author(self, obj):
-        from users.serializers import UserSerializer
-        return UserSerializer(obj.author, context=self.context).data
+        from users.serializers import RecipeAuthorSerializer
+        return RecipeAuthorSerializer(obj.author, context=self.context).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return obj.favorites.filter(user=user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_anonymous:
             return False
@@ -99,32 +107,92 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             'ingredients', 'tags',
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        for ing in ingredients:
-            IngredientInRecipe.objects.create(
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
                 recipe=recipe,
                 ingredient=ing['ingredient'],
                 amount=ing['amount']
             )
+            for ing in ingredients
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         instance.tags.set(tags)
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        for ing in ingredients:
-            IngredientInRecipe.objects.create(
-                recipe=instance,
-                ingredient=ing['ingredient'],
-                amount=ing['amount']
+        deltas = self._update_ingredients(instance, ingredients)
+        if deltas:
+            ShoppingListItem.objects.apply_deltas(
+                list(ShoppingCart.objects.filter(
+                    recipe=instance
+                ).values_list('user_id', flat=True)),
+                deltas
             )
         return super().update(instance, validated_data)
 
+    def _update_ingredients(self, recipe, ingredients):
+        # Удаление строк отправляет сигналы, и списки покупок поправят их
+        # обработчики; bulk_update и bulk_create сигналов не шлют, поэтому
+        # для них возвращаем изменения количеств.
+        amounts = {ing['ingredient'].id: ing['amount'] for ing in ingredients}
+        existing = {
+            item.ingredient_id: item
+            for item in IngredientInRecipe.objects.filter(recipe=recipe)
+        }
+        removed = [
+            item.id for ingredient_id, item in existing.items()
+            if ingredient_id not in amounts
+        ]
+        if removed:
+            IngredientInRecipe.objects.filter(id__in=removed).delete()
+        deltas = {}
+        changed = []
+        for ingredient_id, item in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != item.amount:
+                deltas[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        added = [
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ]
+        if added:
+            IngredientInRecipe.objects.bulk_create(added)
+            deltas.update((item.ingredient_id, item.amount) for item in added)
+        return deltas
+
+    def validate_ingredients(self, value):
+        ingredients = Ingredient.objects.in_bulk(
+            [item['id'] for item in value]
+        )
+        missing = [
+            item['id'] for item in value if item['id'] not in ingredients
+        ]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не существуют: {missing}.'
+            )
+        return [
+            {'ingredient': ingredients[item['id']], 'amount': item['amount']}
+            for item in value
+        ]
+
     def validate(self, data):
         ingredients = data.get('ingredients')
         tags = data.get('tags')
@@ -161,3 +229,32 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
+
+
+class IngredientSearchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False
+    )
+    mode = serializers.ChoiceField(
+        choices=('all', 'any', 'missing'), default='all'
+    )
+    max_missing = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_INGREDIENT_SEARCH_LIMIT,
+        default=INGREDIENT_SEARCH_LIMIT
+    )
+
+
+class BatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE,
+        error_messages={
+            'max_length': 'Не больше {max_length} идентификаторов за раз.'
+        }
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+CHANGELISTS = (
+    'recipes/recipe', 'recipes/tag', 'recipes/ingredient',
+    'recipes/favorite', 'recipes/shoppingcart', 'users/user',
+    'users/subscription',
+)
+
+
+# Варианты картинки готовит фоновый поток, здесь они не нужны.
+@mock.patch('api.signals.schedule_variants', mock.Mock())
+class AdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com',
+            first_name='Админ', last_name='Сайта', password='password'
+        )
+        cls.busy, cls.quiet = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                first_name='Автор', last_name='Рецептов', password='password'
+            )
+            for username in ('busy', 'quiet')
+        )
+        cls.tag = Tag.objects.create(name='Обед', slug='lunch')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('сахар', 'сахарная пудра', 'ванильный сахар', 'соль')
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_recipes(self, author, count):
+        recipes = []
+        for _ in range(count):
+            recipe = Recipe.objects.create(
+                author=author, name='Суп', text='Описание', cooking_time=10,
+                image='recipes/images/recipe.png'
+            )
+            recipe.tags.set([self.tag])
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=self.ingredients[0], amount=5
+            )
+            Favorite.objects.create(user=self.quiet, recipe=recipe)
+            ShoppingCart.objects.create(user=self.quiet, recipe=recipe)
+            recipes.append(recipe)
+        return recipes
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/admin/{path}')
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_changelist_cost_does_not_depend_on_rows(self):
+        self.create_recipes(self.busy, 1)
+        Subscription.objects.create(user=self.quiet, author=self.busy)
+        before = [self.get(f'{path}/')[1] for path in CHANGELISTS]
+        self.create_recipes(self.quiet, 3)
+        Subscription.objects.create(user=self.busy, author=self.quiet)
+        after = [self.get(f'{path}/')[1] for path in CHANGELISTS]
+        self.assertEqual(before, after)
+
+    def test_recipe_page_does_not_list_all_ingredients(self):
+        recipe = self.create_recipes(self.busy, 1)[0]
+        for path in (f'recipes/recipe/{recipe.pk}/change/',
+                     'recipes/recipe/add/'):
+            content = self.get(path)[0].content.decode()
+            self.assertNotIn('ванильный сахар', content)
+            self.assertNotIn('>quiet<', content)
+
+    def test_author_filter_lists_active_authors(self):
+        self.create_recipes(self.busy, 2)
+        self.create_recipes(self.quiet, 1)
+        changelist = self.get('recipes/recipe/')[0].context['cl']
+        self.assertEqual(
+            [
+                choice['display']
+                for choice in changelist.filter_specs[0].choices(changelist)
+            ],
+            ['Все', 'busy', 'quiet']
+        )
+        changelist = self.get(
+            f'recipes/recipe/?author={self.quiet.pk}'
+        )[0].context['cl']
+        self.assertEqual(
+            {recipe.author_id for recipe in changelist.result_list},
+            {self.quiet.pk}
+        )
+
+    def test_ingredient_search_matches_name_start(self):
+        response = self.get('recipes/ingredient/?q=сах')[0]
+        self.assertEqual(
+            sorted(
+                ingredient.name
+                for ingredient in response.context['cl'].result_list
+            ),
+            ['сахар', 'сахарная пудра']
+        )
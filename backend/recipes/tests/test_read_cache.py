@@ -0,0 +1,144 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class RecipeDetailCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Борщ', text='Классический рецепт.',
+            cooking_time=10, image='recipes/images/recipe.png'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def test_counter_change_replaces_cached_detail(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.json()['favorites_count'], 0)
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        client.post(f'{self.url}favorite/')
+        second = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=first.headers['ETag']
+        )
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['favorites_count'], 1)
+        self.assertNotEqual(second.headers['ETag'], first.headers['ETag'])
+
+    def test_author_counters_not_embedded(self):
+        author = self.client.get(self.url).json()['author']
+        self.assertEqual(author['username'], 'author')
+        self.assertNotIn('recipes_count', author)
+        self.assertNotIn('subscribers_count', author)
+
+
+# Варианты картинки готовит фоновый поток, здесь они не нужны.
+@mock.patch('api.signals.schedule_variants', mock.Mock())
+class RecipeListCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.tag = Tag.objects.create(name='Обед', slug='lunch')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Борщ', text='Классический рецепт.',
+            cooking_time=10, image='recipes/images/recipe.png'
+        )
+        cls.recipe.tags.set([cls.tag])
+        cls.reader, cls.viewer = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                first_name='Читатель', last_name='Рецептов',
+                password='password'
+            )
+            for username in ('reader', 'viewer')
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = '/api/recipes/'
+        self.etag = self.client.get(self.url).headers['ETag']
+        self.detail_url = f'{self.url}{self.recipe.pk}/'
+        self.detail_etag = self.client.get(self.detail_url).headers['ETag']
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def assert_changed(self):
+        response = self.revalidate(self.url, self.etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], self.etag)
+        self.assertEqual(
+            self.revalidate(self.detail_url, self.detail_etag).status_code,
+            200
+        )
+        return response.json()['results']
+
+    def test_tag_rename_replaces_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Ужин'
+            self.tag.save()
+        self.assertEqual(self.assert_changed()[0]['tags'][0]['name'], 'Ужин')
+
+    def test_author_rename_replaces_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Повар'
+            self.author.save()
+        self.assertEqual(
+            self.assert_changed()[0]['author']['first_name'], 'Повар'
+        )
+
+    def test_recipe_edit_replaces_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Щи'
+            self.recipe.save()
+        self.assertEqual(self.assert_changed()[0]['name'], 'Щи')
+
+    def test_unrelated_author_fields_keep_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.set_password('new-password')
+            self.author.save(update_fields=['password'])
+        self.assertEqual(self.revalidate(self.url, self.etag).status_code, 304)
+        self.assertEqual(
+            self.revalidate(self.detail_url, self.detail_etag).status_code,
+            304
+        )
+
+    def add_by_reader(self, action):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'{self.detail_url}{action}/')
+        self.assertEqual(response.status_code, 201)
+
+    def test_other_users_favorite_replaces_list(self):
+        viewer = APIClient()
+        viewer.force_authenticate(self.viewer)
+        viewer_etag = viewer.get(self.url).headers['ETag']
+        self.add_by_reader('favorite')
+        self.assertEqual(self.assert_changed()[0]['favorites_count'], 1)
+        response = viewer.get(self.url, HTTP_IF_NONE_MATCH=viewer_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['favorites_count'], 1)
+
+    def test_other_users_cart_replaces_list(self):
+        self.add_by_reader('shopping_cart')
+        self.assertEqual(self.assert_changed()[0]['in_carts_count'], 1)
@@ -0,0 +1,48 @@
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+
+from recipes.models import Recipe
+from recipes.search import search_recipes
+from users.models import User
+
+
+class SearchRecipesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.in_text, cls.in_name, cls.other = (
+            Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=10,
+                image='recipes/images/recipe.png'
+            )
+            for name, text in (
+                ('Обед', 'Сварите борщ и подайте со сметаной.'),
+                ('Борщ', 'Классический рецепт.'),
+                ('Салат', 'Нарежьте овощи.'),
+            )
+        )
+
+    def test_name_matches_rank_first(self):
+        found = list(search_recipes(Recipe.objects.all(), 'борщ'))
+        self.assertEqual(found, [self.in_name, self.in_text])
+        self.assertGreater(found[0].search_rank, found[1].search_rank)
+
+    def test_read_queryset_skips_search_vector(self):
+        recipe = search_recipes(
+            Recipe.objects.with_read_data(AnonymousUser()), 'салат'
+        ).get()
+        self.assertEqual(recipe, self.other)
+        self.assertIn('search_vector', recipe.get_deferred_fields())
+
+    def test_cursor_rejected_with_search(self):
+        response = self.client.get('/api/recipes/?search=борщ&cursor=')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+        response = self.client.get('/api/recipes/?search=борщ')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [self.in_name.id, self.in_text.id]
+        )
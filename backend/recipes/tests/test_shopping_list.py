@@ -0,0 +1,141 @@
+import importlib
+import shutil
+import tempfile
+
+from django.apps import apps
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+
+from recipes.models import (Ingredient, IngredientInRecipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.serializers import RecipeWriteSerializer
+from recipes.tests.test_write_path import image_data
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+fill_shopping_lists = importlib.import_module(
+    'recipes.migrations.0004_shoppinglistitem'
+).fill_shopping_lists
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ShoppingListTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.buyer, cls.other = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name=name, last_name=name, password='password'
+            )
+            for name in ('author', 'buyer', 'other')
+        )
+        cls.tag = Tag.objects.create(name='Обед', slug='lunch')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(5)
+        )
+
+    def save(self, amounts, instance=None):
+        serializer = RecipeWriteSerializer(instance, data={
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': image_data(),
+            'tags': [self.tag.id],
+            'ingredients': [
+                {'id': self.ingredients[index].id, 'amount': amount}
+                for index, amount in amounts.items()
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        if instance is None:
+            return serializer.save(author=self.author)
+        return serializer.save()
+
+    def shopping_list(self, user):
+        return dict(
+            ShoppingListItem.objects.filter(user=user).values_list(
+                'ingredient_id', 'total_amount'
+            )
+        )
+
+    def expected(self, user):
+        return dict(
+            IngredientInRecipe.objects.filter(
+                recipe__shopping_cart__user=user
+            ).values('ingredient').annotate(total=Sum('amount')).order_by()
+            .values_list('ingredient', 'total')
+        )
+
+    def assertConsistent(self):
+        for user in (self.buyer, self.other):
+            self.assertEqual(self.shopping_list(user), self.expected(user))
+
+    def test_cart_changes_update_shopping_list(self):
+        first = self.save({0: 1, 1: 2})
+        second = self.save({1: 3, 2: 4})
+        ShoppingCart.objects.create(user=self.buyer, recipe=first)
+        ShoppingCart.objects.create(user=self.buyer, recipe=second)
+        ShoppingCart.objects.create(user=self.other, recipe=second)
+        self.assertEqual(self.shopping_list(self.buyer), {
+            self.ingredients[0].id: 1, self.ingredients[1].id: 5,
+            self.ingredients[2].id: 4,
+        })
+        self.assertConsistent()
+        ShoppingCart.objects.filter(user=self.buyer, recipe=second).delete()
+        self.assertConsistent()
+        cart = ShoppingCart.objects.get(user=self.other)
+        cart.recipe = first
+        cart.save()
+        self.assertConsistent()
+
+    def test_recipe_edits_update_shopping_list(self):
+        recipe = self.save({0: 1, 1: 2, 2: 3})
+        ShoppingCart.objects.create(user=self.buyer, recipe=recipe)
+        ShoppingCart.objects.create(user=self.other, recipe=recipe)
+        self.save({0: 5, 2: 3, 3: 7}, recipe)
+        self.assertEqual(self.shopping_list(self.buyer), {
+            self.ingredients[0].id: 5, self.ingredients[2].id: 3,
+            self.ingredients[3].id: 7,
+        })
+        self.assertConsistent()
+        item = IngredientInRecipe.objects.get(
+            recipe=recipe, ingredient=self.ingredients[3]
+        )
+        item.amount = 2
+        item.save()
+        self.assertConsistent()
+        item.ingredient = self.ingredients[4]
+        item.save()
+        self.assertConsistent()
+        IngredientInRecipe.objects.filter(
+            recipe=recipe, ingredient=self.ingredients[0]
+        ).delete()
+        self.assertConsistent()
+
+    def test_cascade_deletes_are_not_counted_twice(self):
+        first = self.save({0: 1, 1: 2})
+        second = self.save({1: 3})
+        for recipe in (first, second):
+            ShoppingCart.objects.create(user=self.buyer, recipe=recipe)
+        first.delete()
+        self.assertEqual(
+            self.shopping_list(self.buyer), {self.ingredients[1].id: 3}
+        )
+        self.ingredients[1].delete()
+        self.assertEqual(self.shopping_list(self.buyer), {})
+        self.assertConsistent()
+
+    def test_migration_backfills_shopping_lists(self):
+        recipe = self.save({0: 1, 1: 2})
+        ShoppingCart.objects.create(user=self.buyer, recipe=recipe)
+        ShoppingCart.objects.create(user=self.other, recipe=recipe)
+        ShoppingListItem.objects.all().delete()
+        fill_shopping_lists(apps, None)
+        self.assertConsistent()
+        self.assertTrue(ShoppingListItem.objects.exists())
@@ -0,0 +1,50 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from foodgram_backend.storage import get_content_storage
+from recipes.models import StoredFile
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.storage = get_content_storage()
+
+    def save(self, content=b'content'):
+        name = self.storage.save('files/file.txt', ContentFile(content))
+        self.storage.retain(name)
+        return name
+
+    def test_same_content_is_stored_once(self):
+        first = self.save()
+        second = self.save()
+        self.assertEqual(first, second)
+        self.assertEqual(StoredFile.objects.get(name=first).references, 2)
+
+    def test_unreferenced_file_is_deleted_after_commit(self):
+        name = self.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.storage.release(name))
+            self.assertTrue(self.storage.exists(name))
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_file_saved_again_before_commit_is_kept(self):
+        name = self.save()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.storage.release(name)
+        self.assertEqual(self.save(), name)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
@@ -0,0 +1,214 @@
+import base64
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.serializers import RecipeWriteSerializer
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+TABLE = IngredientInRecipe._meta.db_table
+
+
+def image_data(color='green'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def table_queries(queries, statement):
+    return [
+        query['sql'] for query in queries
+        if query['sql'].startswith(statement) and TABLE in query['sql']
+    ]
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWritePathTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.image = image_data()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(50)
+        )
+
+    def payload(self, amounts, image=None):
+        return {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': image or self.image,
+            'tags': [self.tag.id],
+            'ingredients': [
+                {'id': self.ingredients[index].id, 'amount': amount}
+                for index, amount in amounts.items()
+            ],
+        }
+
+    def save(self, amounts, instance=None):
+        serializer = RecipeWriteSerializer(
+            instance, data=self.payload(amounts)
+        )
+        serializer.is_valid(raise_exception=True)
+        if instance is None:
+            return serializer.save(author=self.author)
+        return serializer.save()
+
+    def stored(self, recipe):
+        return dict(
+            IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+                'ingredient_id', 'amount'
+            )
+        )
+
+    def stored_ids(self, recipe):
+        return dict(
+            IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+                'ingredient_id', 'id'
+            )
+        )
+
+    def create_queries(self, size, color):
+        # Своя картинка на каждый вызов: повторный файл лишь увеличивает
+        # счетчик ссылок и сделал бы второй замер дешевле первого.
+        amounts = {index: index + 1 for index in range(size)}
+        serializer = RecipeWriteSerializer(
+            data=self.payload(amounts, image_data(color))
+        )
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as context:
+            recipe = serializer.save(author=self.author)
+        self.assertEqual(
+            self.stored(recipe),
+            {self.ingredients[index].id: amount
+             for index, amount in amounts.items()}
+        )
+        return context.captured_queries
+
+    def test_create_cost_does_not_depend_on_ingredients(self):
+        # Сам сериализатор пишет ингредиенты одним INSERT. Полный POST
+        # после коммита обходится примерно в 38 запросов, почти все из
+        # них делают обработчики сигналов (кэш, поиск, файлы, похожие).
+        small = self.create_queries(3, 'red')
+        large = self.create_queries(50, 'blue')
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(table_queries(large, 'INSERT')), 1)
+
+    def test_update_cost_does_not_depend_on_ingredients(self):
+        counts = []
+        for size in (3, 50):
+            recipe = self.save({index: 1 for index in range(size)})
+            with CaptureQueriesContext(connection) as context:
+                self.save({index: 2 for index in range(size)}, recipe)
+            counts.append(len(context.captured_queries))
+            self.assertEqual(
+                len(table_queries(context.captured_queries, 'UPDATE')), 1
+            )
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unchanged_ingredients_are_not_rewritten(self):
+        amounts = {index: index + 1 for index in range(50)}
+        recipe = self.save(amounts)
+        ids = self.stored_ids(recipe)
+        with CaptureQueriesContext(connection) as context:
+            self.save(amounts, recipe)
+        for statement in ('INSERT', 'UPDATE', 'DELETE'):
+            self.assertEqual(
+                table_queries(context.captured_queries, statement), []
+            )
+        self.assertEqual(self.stored_ids(recipe), ids)
+
+    def test_changed_amounts_are_updated_in_place(self):
+        recipe = self.save({0: 1, 1: 2, 2: 3})
+        ids = self.stored_ids(recipe)
+        with CaptureQueriesContext(connection) as context:
+            self.save({0: 1, 1: 20, 2: 30}, recipe)
+        self.assertEqual(
+            len(table_queries(context.captured_queries, 'UPDATE')), 1
+        )
+        self.assertEqual(
+            table_queries(context.captured_queries, 'INSERT'), []
+        )
+        self.assertEqual(
+            table_queries(context.captured_queries, 'DELETE'), []
+        )
+        self.assertEqual(self.stored_ids(recipe), ids)
+        self.assertEqual(
+            self.stored(recipe),
+            {self.ingredients[0].id: 1, self.ingredients[1].id: 20,
+             self.ingredients[2].id: 30}
+        )
+
+    def test_removed_ingredients_are_deleted(self):
+        recipe = self.save({0: 1, 1: 2, 2: 3})
+        ids = self.stored_ids(recipe)
+        with CaptureQueriesContext(connection) as context:
+            self.save({0: 1, 3: 4}, recipe)
+        self.assertEqual(
+            len(table_queries(context.captured_queries, 'DELETE')), 1
+        )
+        self.assertEqual(
+            len(table_queries(context.captured_queries, 'INSERT')), 1
+        )
+        self.assertEqual(
+            table_queries(context.captured_queries, 'UPDATE'), []
+        )
+        stored_ids = self.stored_ids(recipe)
+        self.assertEqual(
+            stored_ids[self.ingredients[0].id], ids[self.ingredients[0].id]
+        )
+        self.assertEqual(
+            self.stored(recipe),
+            {self.ingredients[0].id: 1, self.ingredients[3].id: 4}
+        )
+
+    def test_failed_create_is_rolled_back(self):
+        recipes = Recipe.objects.count()
+        with mock.patch.object(
+            IngredientInRecipe.objects, 'bulk_create',
+            side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.save({0: 1, 1: 2})
+        self.assertEqual(Recipe.objects.count(), recipes)
+        self.assertFalse(IngredientInRecipe.objects.exists())
+
+    def test_failed_update_is_rolled_back(self):
+        recipe = self.save({0: 1, 1: 2, 2: 3})
+        ids = self.stored_ids(recipe)
+        with mock.patch.object(
+            IngredientInRecipe.objects, 'bulk_create',
+            side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.save({0: 5, 3: 4}, recipe)
+        self.assertEqual(self.stored_ids(recipe), ids)
+        self.assertEqual(
+            self.stored(recipe),
+            {self.ingredients[0].id: 1, self.ingredients[1].id: 2,
+             self.ingredients[2].id: 3}
+        )
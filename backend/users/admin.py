@@ -8,14 +8,19 @@ from .models import User, Subscription
 class UserAdmin(UserAdmin):
     list_display = (
         'id', 'email', 'username',
-        'first_name', 'last_name', 'is_staff'
+        'first_name', 'last_name', 'recipes_count', 'subscribers_count',
+        'is_staff'
     )
-    search_fields = ('email', 'username', 'first_name', 'last_name')
+    search_fields = ('^email', '^username', '^last_name')
     list_filter = ('is_staff', 'is_superuser', 'is_active')
     ordering = ('id',)
+    show_full_result_count = False
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
-    search_fields = ('user__username', 'author__username')
+    list_select_related = ('user', 'author')
+    search_fields = ('^user__username', '^author__username')
+    autocomplete_fields = ('user', 'author')
+    show_full_result_count = False
@@ -0,0 +1,101 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_KEY = 'auth:token:{}'
+
+
+class TokenCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def shared_key(self, key):
+        return TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key):
+        # Локальная копия не сверяется с общим кешем: токен, отозванный
+        # в другом процессе, здесь действует еще не дольше
+        # TOKEN_CACHE_LOCAL_TTL секунд.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, credentials = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.local_hits += 1
+                    return self.fresh(credentials)
+                del self._entries[key]
+        credentials = cache.get(self.shared_key(key))
+        if credentials is None:
+            self.misses += 1
+            return None
+        self.shared_hits += 1
+        self._store(key, credentials)
+        return self.fresh(credentials)
+
+    def fresh(self, credentials):
+        # Запрос может менять request.user (например, счетчики в ответе),
+        # поэтому параллельные запросы не должны делить один объект.
+        user, token = credentials
+        return copy.copy(user), token
+
+    def set(self, key, credentials):
+        cache.set(
+            self.shared_key(key), credentials, settings.TOKEN_CACHE_TTL
+        )
+        self._store(key, credentials)
+
+    def _store(self, key, credentials):
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + settings.TOKEN_CACHE_LOCAL_TTL,
+                self.fresh(credentials),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        if keys:
+            # После COMMIT: иначе запрос между удалением и фиксацией снова
+            # положит в кеш пользователя, прочитанного до изменений.
+            transaction.on_commit(partial(self.evict, keys))
+
+    def evict(self, keys):
+        cache.delete_many([self.shared_key(key) for key in keys])
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+        }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+        return credentials
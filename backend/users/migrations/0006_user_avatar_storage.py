@@ -0,0 +1,19 @@
+# Generated by Django 4.2.23 on 2026-10-18 07:51
+
+from django.db import migrations, models
+import foodgram_backend.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(storage=foodgram_backend.storage.get_content_storage, upload_to='users/avatars/', verbose_name='Аватар'),
+        ),
+    ]
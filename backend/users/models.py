@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from foodgram_backend.storage import get_content_storage
+
 FIRST_NAME_MAX_LENGTH = 150
 LAST_NAME_MAX_LENGTH = 150
 
@@ -9,7 +11,18 @@ class User(AbstractUser):
     email = models.EmailField('Email', unique=True)
     first_name = models.CharField('Имя', max_length=FIRST_NAME_MAX_LENGTH)
     last_name = models.CharField('Фамилия', max_length=LAST_NAME_MAX_LENGTH)
-    avatar = models.ImageField('Аватар', upload_to='users/avatars/')
+    avatar = models.ImageField(
+        'Аватар', upload_to='users/avatars/', storage=get_content_storage
+    )
+    avatar_variants = models.JSONField(
+        'Варианты аватара', default=dict, blank=True, editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов', default=0, editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Подписчиков', default=0, editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
@@ -1,6 +1,38 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    page_size_query_param = 'limit'
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_query_param = KeysetPagination.cursor_query_param
+    cursor_ordering = '-id'
+    # Параметры со своим порядком выдачи: курсор по id его бы потерял.
+    ordered_query_params = ('search',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_paginator = None
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view=view)
+        for param in self.ordered_query_params:
+            if param in request.query_params:
+                raise ValidationError({
+                    self.cursor_query_param:
+                        f'Не сочетается с параметром {param}.'
+                })
+        self.keyset_paginator = KeysetPagination()
+        self.keyset_paginator.ordering = self.cursor_ordering
+        self.keyset_paginator.page_size = self.get_page_size(request)
+        self.keyset_paginator.max_page_size = self.max_page_size
+        return self.keyset_paginator.paginate_queryset(
+            queryset, request, view=view
+        )
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -2,6 +2,7 @@ import base64
 import uuid
 
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from djoser.serializers import \
     UserCreateSerializer as DjoserUserCreateSerializer
 from djoser.serializers import UserSerializer as DjoserUserSerializer
@@ -11,6 +12,17 @@ from rest_framework.exceptions import NotAuthenticated
 from .models import User, Subscription
 
 
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit')
+    if limit is None or limit == '':
+        return None
+    if not limit.isdigit():
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Должно быть неотрицательным целым числом.'}
+        )
+    return int(limit)
+
+
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
@@ -21,6 +33,26 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    def to_representation(self, value):
+        representation = {}
+        for variant, files in value.items():
+            if isinstance(files, dict):
+                representation[variant] = {
+                    key: self.build_url(name) for key, name in files.items()
+                }
+            elif variant != 'source':
+                representation[variant] = files
+        return representation
+
+    def build_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
 class UserCreateSerializer(DjoserUserCreateSerializer):
     class Meta(DjoserUserCreateSerializer.Meta):
         model = User
@@ -32,16 +64,20 @@ class UserCreateSerializer(DjoserUserCreateSerializer):
 
 class UserSerializer(DjoserUserSerializer):
     avatar = Base64ImageField()
+    avatar_variants = ImageVariantsField()
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = (
             'id', 'email', 'username',
-            'first_name', 'last_name', 'is_subscribed', 'avatar'
+            'first_name', 'last_name', 'is_subscribed', 'avatar',
+            'avatar_variants', 'recipes_count', 'subscribers_count'
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         user = getattr(request, 'user', None)
         if user and user.is_authenticated:
@@ -57,20 +93,33 @@ class UserSerializer(DjoserUserSerializer):
         return data
 
 
+class RecipeAuthorSerializer(UserSerializer):
+    class Meta(UserSerializer.Meta):
+        # Счетчики автора меняются без правки его рецептов, и ETag карточки
+        # рецепта их не учитывает.
+        fields = (
+            'id', 'email', 'username',
+            'first_name', 'last_name', 'is_subscribed', 'avatar',
+            'avatar_variants'
+        )
+
+
 class SubscriptionSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
     avatar = serializers.ImageField(required=False, allow_null=True)
 
     class Meta:
         model = User
         fields = (
             'id', 'email', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'recipes', 'recipes_count', 'avatar'
+            'is_subscribed', 'recipes', 'recipes_count', 'subscribers_count',
+            'avatar'
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -79,16 +128,12 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 
     def get_recipes(self, obj):
         from api.serializers import ShortRecipeSerializer
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            limit = get_recipes_limit(self.context.get('request'))
+            recipes = obj.recipes.all()[:limit]
         return ShortRecipeSerializer(recipes, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def validate(self, data):
         user = self.context['request'].user
         author = data.get('author')
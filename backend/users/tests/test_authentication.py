@@ -0,0 +1,55 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from users.authentication import CachedTokenAuthentication, token_cache
+from users.models import User
+
+
+@override_settings(TOKEN_CACHE_LOCAL_TTL=60)
+class CachedTokenAuthenticationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        token_cache.evict([self.token.key])
+        self.authentication = CachedTokenAuthentication()
+
+    def test_local_hit_skips_database_and_shared_cache(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        with mock.patch('users.authentication.cache') as shared_cache:
+            with self.assertNumQueries(0):
+                user, _ = self.authentication.authenticate_credentials(
+                    self.token.key
+                )
+        self.assertEqual(user, self.user)
+        shared_cache.get.assert_not_called()
+
+    def test_invalidation_waits_for_commit(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Новое'
+            self.user.save()
+            self.assertIsNotNone(token_cache.get(self.token.key))
+        self.assertIsNone(token_cache.get(self.token.key))
+        user, _ = self.authentication.authenticate_credentials(
+            self.token.key
+        )
+        self.assertEqual(user.first_name, 'Новое')
+
+    def test_requests_get_separate_user_objects(self):
+        first, _ = self.authentication.authenticate_credentials(
+            self.token.key
+        )
+        first.subscribers_count = 100
+        second, _ = self.authentication.authenticate_credentials(
+            self.token.key
+        )
+        self.assertIsNot(first, second)
+        self.assertEqual(second.subscribers_count, 0)
@@ -0,0 +1,64 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+
+class SubscriptionsPageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Автор', last_name=str(number),
+                password='password'
+            )
+            for number in range(4)
+        ]
+        for number, author in enumerate(cls.authors):
+            Subscription.objects.create(user=cls.reader, author=author)
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=author, name=f'Рецепт {index}', text='Описание',
+                    cooking_time=10, image='recipes/images/recipe.png'
+                )
+                for index in range(number + 1)
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def get(self, query):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/users/subscriptions/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(context.captured_queries)
+
+    def test_cost_does_not_depend_on_page_size(self):
+        _, small = self.get('limit=1')
+        _, large = self.get('limit=4')
+        self.assertEqual(small, large)
+
+    def test_recipes_limit_keeps_newest_recipes(self):
+        data, _ = self.get('limit=4&recipes_limit=2')
+        self.assertEqual(
+            [author['id'] for author in data['results']],
+            [author.id for author in self.authors]
+        )
+        for author in data['results']:
+            expected = list(Recipe.objects.filter(
+                author_id=author['id']
+            ).order_by('-id').values_list('id', flat=True)[:2])
+            self.assertEqual(
+                [recipe['id'] for recipe in author['recipes']], expected
+            )
+            self.assertTrue(author['is_subscribed'])
@@ -1,6 +1,7 @@
 from django.urls import path
 
-from .views import AvatarView, SubscribeView, SubscriptionsView
+from .views import (AvatarView, SubscribeBatchView, SubscribeView,
+                    SubscriptionsView, TokenCacheStatsView)
 
 urlpatterns = [
     path(
@@ -8,6 +9,11 @@ urlpatterns = [
         SubscribeView.as_view(),
         name='subscribe'
     ),
+    path(
+        'users/subscribe/',
+        SubscribeBatchView.as_view(),
+        name='subscribe-batch'
+    ),
     path(
         'users/subscriptions/',
         SubscriptionsView.as_view(),
@@ -18,4 +24,9 @@ urlpatterns = [
         AvatarView.as_view(),
         name='avatar'
     ),
+    path(
+        'auth/token/cache/',
+        TokenCacheStatsView.as_view(),
+        name='token-cache'
+    ),
 ]
@@ -1,14 +1,22 @@
+from django.db import transaction
+from django.db.models import F, Prefetch, Value, Window
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions, status
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api.batch import NOT_FOUND, add_pairs, batch_results, remove_pairs
+from recipes.models import Recipe
+from recipes.serializers import BatchSerializer
+from .authentication import token_cache
 from .models import Subscription, User
+from .pagination import LimitPageNumberPagination
 from .serializers import (AvatarUpdateSerializer, SubscriptionSerializer,
-                          SubscriptionCreateSerializer, UserSerializer)
+                          SubscriptionCreateSerializer, UserSerializer,
+                          get_recipes_limit)
 
 MAX_PAGE_SIZE = 100
 
@@ -16,6 +24,7 @@ MAX_PAGE_SIZE = 100
 class SubscribeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @transaction.atomic
     def post(self, request, id):
         user = request.user
         author = get_object_or_404(User, id=id)
@@ -25,6 +34,8 @@ class SubscribeView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        # Счетчик в базе поправил сигнал, а объект автора прочитан до него.
+        author.subscribers_count += 1
         output_serializer = SubscriptionSerializer(
             author, context={'request': request}
         )
@@ -44,9 +55,39 @@ class SubscribeView(APIView):
         )
 
 
-class LimitPagination(PageNumberPagination):
-    page_size_query_param = 'limit'
+class SubscribeBatchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request):
+        return self.handle(request, add_pairs, 'created', 'exists')
+
+    @transaction.atomic
+    def delete(self, request):
+        return self.handle(request, remove_pairs, 'deleted', 'absent')
+
+    def handle(self, request, write, done, unchanged):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        existing = set(
+            User.objects.filter(pk__in=ids).values_list('id', flat=True)
+        )
+        skipped = {pk: NOT_FOUND for pk in ids if pk not in existing}
+        if user.id in existing:
+            skipped[user.id] = 'self'
+        changed = write(Subscription, 'user', user.id, 'author', [
+            pk for pk in ids if pk not in skipped
+        ])
+        return Response({'results': batch_results(
+            ids, changed, done, unchanged, skipped
+        )})
+
+
+class LimitPagination(LimitPageNumberPagination):
     max_page_size = MAX_PAGE_SIZE
+    cursor_ordering = 'id'
 
 
 class SubscriptionsView(APIView):
@@ -54,7 +95,17 @@ class SubscriptionsView(APIView):
 
     def get(self, request):
         user = request.user
-        authors = User.objects.filter(subscribers__user=user)
+        recipes = Recipe.objects.defer('search_vector')
+        limit = get_recipes_limit(request)
+        if limit is not None:
+            recipes = recipes.annotate(row_number=Window(
+                RowNumber(), partition_by=F('author'), order_by=F('id').desc()
+            )).filter(row_number__lte=limit)
+        authors = User.objects.filter(subscribers__user=user).annotate(
+            is_subscribed=Value(True)
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        ).order_by('id')
         paginator = LimitPagination()
         page = paginator.paginate_queryset(authors, request, view=self)
         serializer = SubscriptionSerializer(
@@ -74,6 +125,8 @@ class AvatarView(APIView):
             status=status.HTTP_200_OK
         )
 
+    # Блокировка имени файла в хранилище держится до учета ссылки на него.
+    @transaction.atomic
     def put(self, request):
         user = request.user
         serializer = AvatarUpdateSerializer(
@@ -94,3 +147,10 @@ class AvatarView(APIView):
             user.avatar = None
             user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TokenCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(token_cache.stats())